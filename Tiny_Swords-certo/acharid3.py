@@ -1,11 +1,20 @@
+import os
+import sys
 import pygame
+from collections import OrderedDict
+
+# Permite importar o pacote engine/ da raiz do repositório
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from engine.tileset import load_tileset
 
 pygame.init()
 screen = pygame.display.set_mode((800, 1000))
 clock = pygame.time.Clock()
 
-# Carrega sua spritesheet
-spritesheet = pygame.image.load('Tiny_Swords-certo\spritesheet.png').convert_alpha()
+# Carrega sua spritesheet (caminho com os.path.join para funcionar em
+# qualquer sistema)
+SHEET_PATH = os.path.join('Tiny_Swords-certo', 'spritesheet.png')
+spritesheet = pygame.image.load(SHEET_PATH).convert_alpha()
 spritesheet_rect = spritesheet.get_rect()
 
 # Variáveis para navegação
@@ -16,9 +25,47 @@ last_mouse_pos = (0, 0)
 selected_tile = None
 t = 64 # altere conforme o tamanho do tile
 
+# Grade da spritesheet: a mesma conta que o jogo usa para achar a posição de
+# cada id (o .tileset.json ao lado da folha pode mudar o tamanho do tile)
+tileset = load_tileset(SHEET_PATH, t)
+t = tileset.tile_size
+
+# Cache por nível de zoom: a folha escalada e a grade já desenhada.
+# O zoom anda em passos de ZOOM_STEP, então cada nível é gerado uma vez e os
+# MAX_ZOOM_LEVELS usados mais recentemente ficam guardados (LRU).
+ZOOM_STEP = 0.1
+MAX_ZOOM_LEVELS = 8
+zoom_cache = OrderedDict()  # nível -> (folha escalada, grade)
+
+def get_zoom_level(zoom):
+    level = round(zoom / ZOOM_STEP)
+    if level in zoom_cache:
+        zoom_cache.move_to_end(level)
+        return zoom_cache[level]
+    
+    width = int(spritesheet_rect.width * zoom)
+    height = int(spritesheet_rect.height * zoom)
+    scaled_sheet = pygame.transform.scale(spritesheet, (width, height))
+    
+    # Grade numa superfície transparente (colorkey preto), desenhada uma vez
+    grid = pygame.Surface((width + 1, height + 1))
+    grid.set_colorkey((0, 0, 0))
+    for x in range(0, width, int(t * zoom)):
+        pygame.draw.line(grid, (255, 255, 255, 100), (x, 0), (x, spritesheet_rect.height * zoom), 1)
+    for y in range(0, height, int(t * zoom)):
+        pygame.draw.line(grid, (255, 255, 255, 100), (0, y), (spritesheet_rect.width * zoom, y), 1)
+    
+    zoom_cache[level] = (scaled_sheet, grid)
+    if len(zoom_cache) > MAX_ZOOM_LEVELS:
+        zoom_cache.popitem(last=False)
+    return zoom_cache[level]
+
 running = True
+needs_redraw = True
 while running:
-    for event in pygame.event.get():
+    # Sem eventos não há o que redesenhar: espera parado (CPU quase zero)
+    events = [pygame.event.wait()] + pygame.event.get()
+    for event in events:
         if event.type == pygame.QUIT:
             running = False
         
@@ -30,12 +77,17 @@ while running:
                 tile_y = (mouse_y - offset_y) // (t * zoom)
                 if 0 <= tile_x < (spritesheet_rect.width // t) and 0 <= tile_y < (spritesheet_rect.height // t):
                     selected_tile = (tile_x * t, tile_y * t)
-                    print(f"Tile selecionado: ({selected_tile[0]}, {selected_tile[1]}) - ID sugerido: {tile_y * (spritesheet_rect.width // t) + tile_x}")
+                    # O jogo já calcula a posição pelo id; só ids fora da
+                    # conta precisam ir para o .tileset.json
+                    print(f"Tile selecionado: ({selected_tile[0]}, {selected_tile[1]}) - ID: {tileset.id_at(int(selected_tile[0]), int(selected_tile[1]))}")
+                    needs_redraw = True
             
             elif event.button == 4:  # Roda do mouse para cima
-                zoom = min(zoom + 0.1, 5)
+                zoom = round(min(zoom + ZOOM_STEP, 5) / ZOOM_STEP) * ZOOM_STEP
+                needs_redraw = True
             elif event.button == 5:  # Roda do mouse para baixo
-                zoom = max(zoom - 0.1, 1)
+                zoom = round(max(zoom - ZOOM_STEP, 1) / ZOOM_STEP) * ZOOM_STEP
+                needs_redraw = True
         
         elif event.type == pygame.MOUSEMOTION:
             if dragging:
@@ -45,25 +97,23 @@ while running:
                 offset_x += dx
                 offset_y += dy
                 last_mouse_pos = (mouse_x, mouse_y)
+                needs_redraw = True
         
         elif event.type == pygame.MOUSEBUTTONUP:
             dragging = False
+        
+        elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED):
+            needs_redraw = True
     
-    # Desenha a spritesheet com zoom
-    scaled_sheet = pygame.transform.scale(
-        spritesheet, 
-        (int(spritesheet_rect.width * zoom), int(spritesheet_rect.height * zoom))
-    )
+    if not running or not needs_redraw:
+        continue
+    needs_redraw = False
+    
+    # Desenha a spritesheet com zoom e a grade (ambas em cache)
+    scaled_sheet, grid = get_zoom_level(zoom)
     screen.fill((40, 40, 40))
     screen.blit(scaled_sheet, (offset_x, offset_y))
-    
-    # Desenha grade
-    for x in range(0, int(spritesheet_rect.width * zoom), int(t * zoom)):
-        pygame.draw.line(screen, (255, 255, 255, 100), (x + offset_x, offset_y), 
-                         (x + offset_x, offset_y + spritesheet_rect.height * zoom), 1)
-    for y in range(0, int(spritesheet_rect.height * zoom), int(t * zoom)):
-        pygame.draw.line(screen, (255, 255, 255, 100), (offset_x, y + offset_y), 
-                         (offset_x + spritesheet_rect.width * zoom, y + offset_y), 1)
+    screen.blit(grid, (offset_x, offset_y))
     
     # Destaca tile selecionado
     if selected_tile:
@@ -1,20 +1,81 @@
 import pygame
-import json
-# import os
+import os
+import sys
+
+# Permite importar o pacote engine/ da raiz do repositório
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from engine.collision import build_collision_index
+from engine.animation import TileAnimations
+from engine.atlas import load_atlas
+from engine.cache import BakedChunks
+# from engine.hud import HudText, TextCache
+from engine.loader import AssetLoader, run_loading_screen
+from engine.mapfile import load_map
+from engine.profiler import Profiler
+from engine.render import Camera, ChunkRenderer, DirtyRectRenderer
+# from engine.render import draw_outline
+from engine.streaming import WorldStreamer, open_world
+from engine.tilemap import TileTable
+from engine.tileset import load_tileset
+from engine.timestep import FixedTimestep, lerp_rect
 
 # Inicialização do Pygame
 pygame.init()
 
-# Carregar o arquivo JSON do mapa
-with open('Tiny_Swords-certo/map.json') as f:
-    map_data = json.load(f)
+# Janela de carregamento: o mapa e a spritesheet são lidos em segundo plano
+# enquanto ela mostra o progresso; depois a janela ganha o tamanho do mapa
+screen = pygame.display.set_mode((640, 360))
+pygame.display.set_caption("Jogo com Sistema de Colisões e Spritesheet")
+
+# Mapas muito grandes: True mantém na memória só as regiões do mapa perto da
+# câmera (lidas em segundo plano), no lugar do índice de colisão e do
+# renderizador do mapa inteiro
+WORLD_STREAMING = False
+
+# Mapeamento de tiles: a posição de cada id sai da grade da spritesheet
+# (id = linha * colunas + coluna, o "ID sugerido" do acharid3.py), só para
+# os ids usados no mapa. Ids fora da conta e tiles animados ficam em
+# Tiny_Swords-certo/spritesheet.tileset.json.
+def read_tileset(tilemap):
+    tileset = load_tileset('Tiny_Swords-certo/spritesheet.png', tilemap.tile_size)
+    return tileset, tileset.mapping(tilemap.used_ids())
+
+# Ler a spritesheet numa thread, com o tamanho de tile do mapa
+# Só as células do mapeamento vão para um atlas compacto, guardado já
+# decodificado em Tiny_Swords-certo/.cache/
+def read_spritesheet(tilemap, tiles):
+    return load_atlas('Tiny_Swords-certo/spritesheet.png', tiles[1], tilemap.tile_size, convert=False)
+
+# A conversão para o formato da tela precisa ser feita na thread principal
+def convert_spritesheet(result):
+    spritesheet, atlas_mapping = result
+    return spritesheet.convert(), atlas_mapping
+
+# Carregar o mapa (usa o compilado em .cache/ quando o conteúdo do JSON não
+# mudou) e a spritesheet, mostrando a tela de carregamento
+# Com WORLD_STREAMING só o resumo das regiões é lido (tamanho, ids usados e
+# contagens); os tiles ficam nos arquivos de região
+loader = AssetLoader()
+if WORLD_STREAMING:
+    loader.add('mapa', open_world, 'Tiny_Swords-certo/map.json')
+else:
+    loader.add('mapa', load_map, 'Tiny_Swords-certo/map.json')
+loader.add('tiles', read_tileset, after=['mapa'])
+loader.add('spritesheet', read_spritesheet, after=['mapa', 'tiles'], finish=convert_spritesheet)
+assets = run_loading_screen(screen, loader)
+tilemap = assets['mapa']
+tileset, tile_mapping = assets['tiles']
+spritesheet, atlas_mapping = assets['spritesheet']
 
 # Configurações do jogo
-TILE_SIZE = map_data['tileSize']
-MAP_WIDTH = map_data['mapWidth']
-MAP_HEIGHT = map_data['mapHeight']
-SCREEN_WIDTH = MAP_WIDTH * TILE_SIZE
-SCREEN_HEIGHT = MAP_HEIGHT * TILE_SIZE
+TILE_SIZE = tilemap.tile_size
+MAP_WIDTH = tilemap.width
+MAP_HEIGHT = tilemap.height
+# A janela nunca passa do tamanho máximo; mapas maiores usam a câmera
+MAX_SCREEN_WIDTH = 1280
+MAX_SCREEN_HEIGHT = 720
+SCREEN_WIDTH = min(MAP_WIDTH * TILE_SIZE, MAX_SCREEN_WIDTH)
+SCREEN_HEIGHT = min(MAP_HEIGHT * TILE_SIZE, MAX_SCREEN_HEIGHT)
 
 # Cores
 BLACK = (0, 0, 0)
@@ -22,51 +83,40 @@ WHITE = (255, 255, 255)
 BLUE = (0, 0, 255)
 RED = (255, 0, 0)  # Para visualização de colisões
 
-# Criar a tela
+# A simulação anda em passos fixos (SIMULATION_RATE por segundo), separada do
+# desenho; MAX_FPS limita só o desenho (0 = sem limite)
+SIMULATION_RATE = 60
+MAX_FPS = 120
+
+# Modo de renderização: 'dirty' redesenha e envia para a janela só as áreas
+# que mudaram; 'flip' redesenha a tela inteira a cada frame
+RENDER_MODE = 'dirty'
+
+# Índice de colisão: 'grid' (lista de tiles por célula) ou 'bitmap' (grade booleana)
+COLLISION_BACKEND = 'grid'
+
+# Criar a tela (agora com o tamanho do mapa)
 screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Jogo com Sistema de Colisões e Spritesheet")
 clock = pygame.time.Clock()
 
-# Classe para carregar a spritesheet
-class SpriteSheet:
-    def __init__(self, filename):
-        try:
-            self.sheet = pygame.image.load(filename).convert_alpha()
-            print("Spritesheet carregada com sucesso!")
-        except Exception as e:
-            print(f"Erro ao carregar spritesheet: {e}")
-            self.sheet = None
-    
-    def get_sprite(self, x, y, width, height):
-        if self.sheet:
-            sprite = pygame.Surface((width, height), pygame.SRCALPHA)
-            sprite.blit(self.sheet, (0, 0), (x, y, width, height))
-            return sprite
-        return None
-
-# Carregar a spritesheet
-spritesheet = SpriteSheet('Tiny_Swords-certo/spritesheet.png')
-
-# Dicionário de mapeamento de tiles (ajuste conforme sua spritesheet)
-TILE_MAPPING = {
-    # está tudo confuso, mas está certo
-    # Background
-    '33': (64, 256),
-    
-    # resto
-    '0': (0, 0), '1': (64, 0), '2': (128, 0),
-    '3': (192, 0), '4': (256, 0), '5': (320, 0),
-    '6': (384, 0), '7': (448, 0), '8': (0, 64),
-    '9': (64, 64), '10': (128, 64), '11': (192, 64),
-    '12': (256, 64), '13': (320, 64), '14': (384, 64),
-    '15': (448, 64), '16': (0, 128), '17': (64, 128),
-    '18': (128, 128), '19': (192, 128), '20': (256, 128),
-    '21': (320, 128), '22': (384, 128), '23': (448, 128),
-    '24': (0, 192), '25': (64, 192), '26': (128, 192),
-    '27': (192, 192), '28': (256, 192), '29': (320, 192),
-    '30': (384, 192), '31': (448, 192), '32': (0, 256),
+# Medição de desempenho: F3 mostra/esconde o overlay, F4 salva a trilha
+profiler = Profiler()
+
+# Cores usadas quando o tile não tem imagem na spritesheet
+LAYER_COLORS = {
+    'Buildings': (150, 150, 150),
+    'Rocks': (100, 100, 100),
+    'Cliff': (120, 80, 50),
+    'Sand': (210, 180, 140),
+    'Grass': (100, 180, 100),
+    'Background': (50, 50, 150),
+    'pedras_para_preencher': (200, 200, 200),
+    'escadas': (200, 0, 200),
 }
 
+# Ordem de renderização das camadas (do fundo para a frente)
+LAYER_ORDER = ['Background', 'Sand', 'pedras_para_preencher_vazio','Grass', 'Rocks', 'Small rocks', 'Stairs', 'Cliff', 'Buildings', 'escadas']
+
 # Classe do jogador com colisões aprimoradas
 class Player:
     def __init__(self, x, y):
@@ -74,8 +124,9 @@ class Player:
         self.y = y * TILE_SIZE
         self.width = TILE_SIZE - 4  # Ligeiramente menor que o tile para melhor colisão
         self.height = TILE_SIZE - 4
-        self.speed = 4
+        self.speed = 4  # pixels por passo de simulação
         self.rect = pygame.Rect(self.x, self.y, self.width, self.height)
+        self.prev_rect = self.rect.copy()  # posição no passo anterior
         
         # Sprite do jogador
         if spritesheet.sheet:
@@ -87,6 +138,7 @@ class Player:
             self.image.fill(BLUE)
     
     def update(self, walls):
+        self.prev_rect = self.rect.copy()
         keys = pygame.key.get_pressed()
         
         dx, dy = 0, 0
@@ -105,145 +157,154 @@ class Player:
         if dy != 0:
             self.move_single_axis(0, dy, walls)
     
+    # Varre o caminho pelos tiles e para encostado na primeira parede,
+    # então nenhuma velocidade atravessa paredes
     def move_single_axis(self, dx, dy, walls):
-        self.rect.x += dx
-        self.rect.y += dy
-        
-        for wall in walls:
-            if self.rect.colliderect(wall['rect']):
-                if dx > 0:  # Movendo para direita
-                    self.rect.right = wall['rect'].left
-                elif dx < 0:  # Movendo para esquerda
-                    self.rect.left = wall['rect'].right
-                elif dy > 0:  # Movendo para baixo
-                    self.rect.bottom = wall['rect'].top
-                elif dy < 0:  # Movendo para cima
-                    self.rect.top = wall['rect'].bottom
+        t, normal, tested = walls.sweep(self.rect, dx, dy)
+        profiler.count('colisões', tested)
+        self.rect.x += round(dx * t)
+        self.rect.y += round(dy * t)
         
         self.x = self.rect.x
         self.y = self.rect.y
     
-    def draw(self, surface):
-        surface.blit(self.image, (self.rect.x, self.rect.y))
-
-# Processar o mapa para colisões
-def process_map_for_collision(map_data):
-    walls = []
-    
-    for layer in map_data['layers']:
-        if layer['collider']:
-            for tile in layer['tiles']:
-                x = int(tile['x']) * TILE_SIZE
-                y = int(tile['y']) * TILE_SIZE
-                walls.append({
-                    'rect': pygame.Rect(x, y, TILE_SIZE, TILE_SIZE),
-                    'layer': layer['name']
-                })
+    # Posição para desenhar, entre o passo anterior e o atual
+    def render_rect(self, alpha):
+        return lerp_rect(self.prev_rect, self.rect, alpha)
     
-    return walls
+    def draw(self, surface, camera, alpha=1.0):
+        surface.blit(self.image, camera.apply(self.render_rect(alpha)))
 
-# Processar o mapa para renderização com spritesheet (corrigido)
-def process_map_for_rendering(map_data):
-    tiles = []
-    
-    # Ordem de renderização das camadas (do fundo para a frente)
-    layer_order = ['Background', 'Sand', 'pedras_para_preencher_vazio','Grass', 'Rocks', 'Small rocks', 'Stairs', 'Cliff', 'Buildings', 'escadas']
-    
-    # Criar um dicionário para agrupar tiles por camada
-    layer_dict = {layer_name: [] for layer_name in layer_order}
-    
-    # Agrupar todos os tiles por camada
-    for layer in map_data['layers']:
-        layer_name = layer['name']
-        if layer_name not in layer_dict:
-            layer_dict[layer_name] = []
-        
-        for tile in layer['tiles']:
-            tile_id = str(tile['id'])
-            x = int(tile['x']) * TILE_SIZE
-            y = int(tile['y']) * TILE_SIZE
-            
-            if tile_id in TILE_MAPPING and spritesheet.sheet:
-                sprite_x, sprite_y = TILE_MAPPING[tile_id]
-                image = spritesheet.get_sprite(sprite_x, sprite_y, TILE_SIZE, TILE_SIZE)
-                color = None
-            else:
-                image = None
-                color = {
-                    'Buildings': (150, 150, 150),
-                    'Rocks': (100, 100, 100),
-                    'Cliff': (120, 80, 50),
-                    'Sand': (210, 180, 140),
-                    'Grass': (100, 180, 100),
-                    'Background': (50, 50, 150),
-                    'pedras_para_preencher': (200, 200, 200),
-                    'escadas': (200, 0, 200),
-                }.get(layer_name, (200, 200, 200))
-            
-            layer_dict[layer_name].append({
-                'rect': pygame.Rect(x, y, TILE_SIZE, TILE_SIZE),
-                'image': image,
-                'color': color,
-                'layer': layer_name,
-                'collider': layer['collider']
-            })
+# Relógio dos tiles animados: todas as instâncias de um id trocam de quadro juntas
+animations = TileAnimations(tileset.animations)
+
+# Tabela por id: imagem da spritesheet (o quadro atual, nos ids animados) ou
+# cor da camada quando não há imagem
+tile_table = TileTable(spritesheet, atlas_mapping, TILE_SIZE, LAYER_COLORS, default_color=(200, 200, 200),
+                       animations=animations)
+
+# Processar o mapa para colisões (índice espacial por tile)
+def process_map_for_collision(tilemap):
+    return build_collision_index(tilemap, COLLISION_BACKEND)
+
+# Processar o mapa para renderização com spritesheet
+# As camadas compactas vão direto para o renderizador, na ordem de LAYER_ORDER
+def process_map_for_rendering(tilemap):
+    renderer = ChunkRenderer(MAP_WIDTH, MAP_HEIGHT, TILE_SIZE, LAYER_ORDER)
+    tile_count = 0
     
-    # Adicionar os tiles na ordem correta
-    for layer_name in layer_order:
-        if layer_name in layer_dict:
-            tiles.extend(layer_dict[layer_name])
+    for layer in tilemap.layers:
+        if layer.name in LAYER_ORDER:
+            renderer.set_grid_layer(layer, tile_table)
+            tile_count += len(layer)
     
-    return tiles
+    # Chunks já desenhados em execuções anteriores são lidos de .cache/; a
+    # chave muda sozinha quando o mapa, a spritesheet, o mapeamento ou as cores mudam
+    renderer.use_baked(BakedChunks.for_world('Tiny_Swords-certo/map.json', 'Tiny_Swords-certo/spritesheet.png', tile_mapping,
+                                             LAYER_ORDER, LAYER_COLORS))
+    return renderer, tile_count
 
 # Processar o mapa
-walls = process_map_for_collision(map_data)
-tiles = process_map_for_rendering(map_data)
+if WORLD_STREAMING:
+    world = WorldStreamer(tilemap.directory, tile_table, LAYER_ORDER)
+    walls = renderer = world
+    tile_count = tilemap.tile_count(LAYER_ORDER)
+else:
+    walls = process_map_for_collision(tilemap)
+    renderer, tile_count = process_map_for_rendering(tilemap)
+renderer.set_animations(animations)
+wall_count = len(walls)
+
+camera = Camera(SCREEN_WIDTH, SCREEN_HEIGHT, MAP_WIDTH * TILE_SIZE, MAP_HEIGHT * TILE_SIZE)
+
+# Desenhar o cenário: tiles (só os chunks visíveis, já em cache) e o debug
+# das paredes, que também não muda de um frame para o outro
+def draw_world(surface, camera):
+    surface.fill(BLACK)
+    profiler.count('blits', renderer.draw(surface, camera))
+    
+    # Desenhar paredes (debug) - opcional
+    # for wall in walls.query(camera.rect):
+    #     draw_outline(surface, RED, camera.apply(wall['rect']))
+
+dirty = DirtyRectRenderer(screen, draw_world)
 
 # Criar o jogador
 player = Player(5, 5)
 
+# HUD de debug (desligado, junto com o desenho no loop): a fonte é carregada
+# uma vez e cada linha só é renderizada quando muda
+# text_cache = TextCache()
+# debug_texts = [
+#     HudText(text_cache, "Posição: ({}, {})", WHITE, (10, 10)),
+#     HudText(text_cache, "Tiles renderizados: {}", WHITE, (10, 35)),
+#     HudText(text_cache, "Tiles colidíveis: {}", WHITE, (10, 60)),
+#     HudText(text_cache, "Setas/WASD: mover | F3: perfil | ESC: sair", WHITE, (10, 85)),
+# ]
+
 # Game loop
+timestep = FixedTimestep(SIMULATION_RATE)
 running = True
 while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        elif event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_ESCAPE:
+    # Tempo real do frame vai para o acumulador do passo fixo
+    dt = clock.tick(MAX_FPS)
+    steps = timestep.advance(dt)
+    
+    with profiler.section('eventos'):
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
                 running = False
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    running = False
+                elif event.key == pygame.K_F3:
+                    profiler.toggle()
+                elif event.key == pygame.K_F4:
+                    profiler.dump('profile_trace.csv')
     
-    player.update(walls)
+    with profiler.section('update'):
+        for _ in range(steps):
+            player.update(walls)
+        alpha = timestep.alpha
+        camera.follow(player.render_rect(alpha))
+        if WORLD_STREAMING:
+            world.update(camera.rect)
+        
+        # Tiles animados: o quadro é calculado uma vez por id e só as células
+        # visíveis com quadro novo são redesenhadas (no modo 'flip' a tela
+        # toda é redesenhada, não há áreas a marcar)
+        animations.advance(dt)
+        for rect in renderer.update_animations(camera.rect):
+            if RENDER_MODE == 'dirty':
+                dirty.invalidate_world(rect)
     
     # Renderização
-    screen.fill(BLACK)
-    
-    # Desenhar tiles - agora com spritesheet e ordem correta
-    for tile in tiles:
-        if tile['image']:
-            screen.blit(tile['image'], (tile['rect'].x, tile['rect'].y))
+    with profiler.section('tiles'):
+        if RENDER_MODE == 'dirty':
+            dirty.begin(camera)
         else:
-            pygame.draw.rect(screen, tile['color'], tile['rect'])
+            draw_world(screen, camera)
     
-    # Desenhar paredes (debug) - opcional
-    # for wall in walls:
-    #     pygame.draw.rect(screen, RED, wall['rect'], 1)
-    
-    player.draw(screen)
+    player.draw(screen, camera, alpha)
     
     # Debug info
-    # font = pygame.font.SysFont(None, 24)
-    # debug_info = [
-    #     f"Posição: ({player.rect.x}, {player.rect.y})",
-    #     f"Tiles renderizados: {len(tiles)}",
-    #     f"Tiles colidíveis: {len(walls)}",
-    #     "Setas/WASD: mover | ESC: sair"
-    # ]
+    # debug_texts[0].set(player.rect.x, player.rect.y)
+    # debug_texts[1].set(tile_count)
+    # debug_texts[2].set(wall_count)
+    # for text in debug_texts:
+    #     text.draw(screen)
     
-    # for i, text in enumerate(debug_info):
-    #     text_surface = font.render(text, True, WHITE)
-    #     screen.blit(text_surface, (10, 10 + i * 25))
-    
-    pygame.display.flip()
-    clock.tick(60)
+    overlay = profiler.draw(screen, (max(SCREEN_WIDTH - 310, 0), 10))
+    with profiler.section('flip'):
+        if RENDER_MODE == 'dirty':
+            dirty.mark(camera.apply(player.render_rect(alpha)))
+            # for text in debug_texts:
+            #     dirty.mark(text.rect)
+            if overlay:
+                dirty.mark(overlay)
+            dirty.end()
+        else:
+            pygame.display.flip()
+    profiler.end_frame()
 
 pygame.quit()
\ No newline at end of file
@@ -1,20 +1,81 @@
 import pygame
-import json
 import os
+import sys
+
+# Permite importar o pacote engine/ da raiz do repositório
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from engine.hud import HudText, TextCache
+from engine.levels import Level, LevelManager
+from engine.profiler import Profiler
+from engine.render import Camera, DirtyRectRenderer, draw_outline
+from engine.timestep import FixedTimestep, lerp_rect
 
 # Inicialização do Pygame
 pygame.init()
 
-# Carregar o arquivo JSON do mapa
-with open('Tiny_Swords-ok/map.json') as f:
-    map_data = json.load(f)
+# Janela de carregamento: o mapa e a spritesheet da primeira fase são lidos
+# em segundo plano enquanto ela mostra o progresso; depois a janela ganha o
+# tamanho do mapa
+screen = pygame.display.set_mode((640, 360))
+pygame.display.set_caption("Jogo com Sistema de Colisões e Spritesheet")
+
+# Cores usadas quando o tile não tem imagem na spritesheet
+LAYER_COLORS = {
+    'Buildings': (150, 150, 150),
+    'Rocks': (100, 100, 100),
+    'Cliff': (120, 80, 50),
+    'Sand': (210, 180, 140),
+    'Grass': (100, 180, 100),
+    'Background': (50, 50, 150)
+}
+
+# Ordem de renderização das camadas (do fundo para a frente)
+LAYER_ORDER = ['Background', 'Sand', 'Grass', 'Rocks', 'Small rocks', 'Stairs', 'Cliff', 'Buildings']
+
+# Segunda fase: o mapa de Tiny_Swords-certo, com as cores e a ordem das
+# camadas do main3.py
+CERTO_LAYER_COLORS = dict(LAYER_COLORS, pedras_para_preencher=(200, 200, 200), escadas=(200, 0, 200))
+CERTO_LAYER_ORDER = ['Background', 'Sand', 'pedras_para_preencher_vazio', 'Grass', 'Rocks', 'Small rocks',
+                     'Stairs', 'Cliff', 'Buildings', 'escadas']
+
+# Índice de colisão: 'grid' (lista de tiles por célula) ou 'bitmap' (grade booleana)
+COLLISION_BACKEND = 'grid'
+
+# Mapas muito grandes: True mantém na memória só as regiões do mapa perto da
+# câmera (lidas em segundo plano), no lugar do índice de colisão e do
+# renderizador do mapa inteiro
+WORLD_STREAMING = False
+
+# Fases, na ordem em que N passa de uma para a outra
+# O mapeamento de tiles de cada fase sai da grade da spritesheet (id = linha
+# * colunas + coluna, o "ID sugerido" do acharid2.py); ids fora da conta são
+# corrigidos no spritesheet.tileset.json ao lado da folha.
+# Mapas e spritesheets ficam num cache compartilhado entre as fases; a
+# próxima fase é carregada em segundo plano enquanto a atual roda, então a
+# troca é imediata, e a fase que sai libera o que só ela usava
+LEVELS = [
+    Level('Tiny Swords', 'Tiny_Swords-ok/map.json', 'Tiny_Swords-ok/spritesheet.png',
+          LAYER_ORDER, LAYER_COLORS, spawn=(5, 5)),
+    Level('Tiny Swords (certo)', 'Tiny_Swords-certo/map.json', 'Tiny_Swords-certo/spritesheet.png',
+          CERTO_LAYER_ORDER, CERTO_LAYER_COLORS, spawn=(5, 5)),
+]
+levels = LevelManager(LEVELS, collision_backend=COLLISION_BACKEND, streaming=WORLD_STREAMING)
+
+# Carregar a primeira fase (mapa compilado e atlas vêm de .cache/ quando os
+# arquivos não mudaram), mostrando a tela de carregamento
+world = levels.switch(LEVELS[0].name, screen)
+tilemap = world.tilemap
+spritesheet = world.spritesheet
 
 # Configurações do jogo
-TILE_SIZE = map_data['tileSize']
-MAP_WIDTH = map_data['mapWidth']
-MAP_HEIGHT = map_data['mapHeight']
-SCREEN_WIDTH = MAP_WIDTH * TILE_SIZE
-SCREEN_HEIGHT = MAP_HEIGHT * TILE_SIZE
+TILE_SIZE = tilemap.tile_size
+MAP_WIDTH = tilemap.width
+MAP_HEIGHT = tilemap.height
+# A janela nunca passa do tamanho máximo; mapas maiores usam a câmera
+MAX_SCREEN_WIDTH = 1280
+MAX_SCREEN_HEIGHT = 720
+SCREEN_WIDTH = min(MAP_WIDTH * TILE_SIZE, MAX_SCREEN_WIDTH)
+SCREEN_HEIGHT = min(MAP_HEIGHT * TILE_SIZE, MAX_SCREEN_HEIGHT)
 
 # Cores
 BLACK = (0, 0, 0)
@@ -22,58 +83,21 @@ WHITE = (255, 255, 255)
 BLUE = (0, 0, 255)
 RED = (255, 0, 0)  # Para visualização de colisões
 
-# Criar a tela
+# A simulação anda em passos fixos (SIMULATION_RATE por segundo), separada do
+# desenho; MAX_FPS limita só o desenho (0 = sem limite)
+SIMULATION_RATE = 60
+MAX_FPS = 120
+
+# Modo de renderização: 'dirty' redesenha e envia para a janela só as áreas
+# que mudaram; 'flip' redesenha a tela inteira a cada frame
+RENDER_MODE = 'dirty'
+
+# Criar a tela (agora com o tamanho do mapa)
 screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Jogo com Sistema de Colisões e Spritesheet")
 clock = pygame.time.Clock()
 
-# Classe para carregar a spritesheet
-class SpriteSheet:
-    def __init__(self, filename):
-        try:
-            self.sheet = pygame.image.load(filename).convert_alpha()
-            print("Spritesheet carregada com sucesso!")
-        except Exception as e:
-            print(f"Erro ao carregar spritesheet: {e}")
-            self.sheet = None
-    
-    def get_sprite(self, x, y, width, height):
-        if self.sheet:
-            sprite = pygame.Surface((width, height), pygame.SRCALPHA)
-            sprite.blit(self.sheet, (0, 0), (x, y, width, height))
-            return sprite
-        return None
-
-# Carregar a spritesheet
-spritesheet = SpriteSheet('Tiny_Swords-ok/spritesheet.png')
-
-# Dicionário de mapeamento de tiles (ajuste conforme sua spritesheet)
-TILE_MAPPING = {
-    # Background
-    '107': (192, 832),
-    
-    # Sand
-    '97': (64, 768), '98': (128, 768), '99': (192, 768),
-    '100': (256, 768), '101': (320, 768), '102': (384, 768),
-    '103': (448, 768), '104': (0, 832), '105': (64, 832),
-    '106': (192, 832),
-    
-    # Grass
-    '76': (256, 576), '77': (320, 576), '78': (384, 576),
-    '79': (448, 576), '80': (0, 640), '81': (64, 640),
-    '82': (128, 640), '83': (192, 640), '84': (256, 640),
-    
-    # Rocks
-    '85': (320, 640), '86': (384, 640), '87': (448, 640),
-    '88': (0, 704), '89': (64, 704), '90': (128, 704),
-    '91': (192, 704), '92': (256, 704), '93': (320, 704),
-    
-    # Buildings (exemplo - ajuste conforme necessário)
-    '0': (0, 0), '1': (64, 0), '2': (128, 0),
-    '3': (192, 0), '4': (256, 0), '5': (320, 0),
-    '6': (384, 0), '7': (448, 0), '8': (0, 64),
-    '9': (64, 64), '10': (128, 64), '11': (192, 64),
-}
+# Medição de desempenho: F3 mostra/esconde o overlay, F4 salva a trilha
+profiler = Profiler()
 
 # Classe do jogador com colisões aprimoradas
 class Player:
@@ -82,8 +106,9 @@ class Player:
         self.y = y * TILE_SIZE
         self.width = TILE_SIZE - 4  # Ligeiramente menor que o tile para melhor colisão
         self.height = TILE_SIZE - 4
-        self.speed = 4
+        self.speed = 4  # pixels por passo de simulação
         self.rect = pygame.Rect(self.x, self.y, self.width, self.height)
+        self.prev_rect = self.rect.copy()  # posição no passo anterior
         
         # Sprite do jogador
         if spritesheet.sheet:
@@ -95,6 +120,7 @@ class Player:
             self.image.fill(BLUE)
     
     def update(self, walls):
+        self.prev_rect = self.rect.copy()
         keys = pygame.key.get_pressed()
         
         dx, dy = 0, 0
@@ -113,143 +139,132 @@ class Player:
         if dy != 0:
             self.move_single_axis(0, dy, walls)
     
+    # Varre o caminho pelos tiles e para encostado na primeira parede,
+    # então nenhuma velocidade atravessa paredes
     def move_single_axis(self, dx, dy, walls):
-        self.rect.x += dx
-        self.rect.y += dy
-        
-        for wall in walls:
-            if self.rect.colliderect(wall['rect']):
-                if dx > 0:  # Movendo para direita
-                    self.rect.right = wall['rect'].left
-                elif dx < 0:  # Movendo para esquerda
-                    self.rect.left = wall['rect'].right
-                elif dy > 0:  # Movendo para baixo
-                    self.rect.bottom = wall['rect'].top
-                elif dy < 0:  # Movendo para cima
-                    self.rect.top = wall['rect'].bottom
+        t, normal, tested = walls.sweep(self.rect, dx, dy)
+        profiler.count('colisões', tested)
+        self.rect.x += round(dx * t)
+        self.rect.y += round(dy * t)
         
         self.x = self.rect.x
         self.y = self.rect.y
     
-    def draw(self, surface):
-        surface.blit(self.image, (self.rect.x, self.rect.y))
-
-# Processar o mapa para colisões
-def process_map_for_collision(map_data):
-    walls = []
+    # Posição para desenhar, entre o passo anterior e o atual
+    def render_rect(self, alpha):
+        return lerp_rect(self.prev_rect, self.rect, alpha)
     
-    for layer in map_data['layers']:
-        if layer['collider']:
-            for tile in layer['tiles']:
-                x = int(tile['x']) * TILE_SIZE
-                y = int(tile['y']) * TILE_SIZE
-                walls.append({
-                    'rect': pygame.Rect(x, y, TILE_SIZE, TILE_SIZE),
-                    'layer': layer['name']
-                })
-    
-    return walls
+    def draw(self, surface, camera, alpha=1.0):
+        surface.blit(self.image, camera.apply(self.render_rect(alpha)))
 
-# Processar o mapa para renderização com spritesheet (corrigido)
-def process_map_for_rendering(map_data):
-    tiles = []
-    
-    # Ordem de renderização das camadas (do fundo para a frente)
-    layer_order = ['Background', 'Sand', 'Grass', 'Rocks', 'Small rocks', 'Stairs', 'Cliff', 'Buildings']
-    
-    # Criar um dicionário para agrupar tiles por camada
-    layer_dict = {layer_name: [] for layer_name in layer_order}
-    
-    # Agrupar todos os tiles por camada
-    for layer in map_data['layers']:
-        layer_name = layer['name']
-        if layer_name not in layer_dict:
-            layer_dict[layer_name] = []
-        
-        for tile in layer['tiles']:
-            tile_id = str(tile['id'])
-            x = int(tile['x']) * TILE_SIZE
-            y = int(tile['y']) * TILE_SIZE
-            
-            if tile_id in TILE_MAPPING and spritesheet.sheet:
-                sprite_x, sprite_y = TILE_MAPPING[tile_id]
-                image = spritesheet.get_sprite(sprite_x, sprite_y, TILE_SIZE, TILE_SIZE)
-                color = None
-            else:
-                image = None
-                color = {
-                    'Buildings': (150, 150, 150),
-                    'Rocks': (100, 100, 100),
-                    'Cliff': (120, 80, 50),
-                    'Sand': (210, 180, 140),
-                    'Grass': (100, 180, 100),
-                    'Background': (50, 50, 150)
-                }.get(layer_name, (200, 200, 200))
-            
-            layer_dict[layer_name].append({
-                'rect': pygame.Rect(x, y, TILE_SIZE, TILE_SIZE),
-                'image': image,
-                'color': color,
-                'layer': layer_name,
-                'collider': layer['collider']
-            })
-    
-    # Adicionar os tiles na ordem correta
-    for layer_name in layer_order:
-        if layer_name in layer_dict:
-            tiles.extend(layer_dict[layer_name])
+# Desenhar o cenário: tiles (só os chunks visíveis, já em cache) e o debug
+# das paredes, que também não muda de um frame para o outro
+def draw_world(surface, camera):
+    surface.fill(BLACK)
+    profiler.count('blits', renderer.draw(surface, camera))
     
-    return tiles
+    # Desenhar paredes (debug) - opcional
+    for wall in walls.query(camera.rect):
+        draw_outline(surface, RED, camera.apply(wall['rect']))
+
+dirty = DirtyRectRenderer(screen, draw_world)
+
+# Entrar numa fase: troca colisão, desenho e câmera, põe o jogador no início
+# e já começa a carregar a fase seguinte em segundo plano. A fase que sai
+# continua carregada quando ela mesma é a seguinte (com só duas fases), em
+# vez de ser liberada e carregada de novo logo depois.
+def start_level(name):
+    global world, spritesheet, walls, renderer, tile_count, wall_count, camera, player
+    following = levels.next_name(name)
+    world = levels.switch(name, screen, keep=[following])
+    spritesheet = world.spritesheet
+    walls = world.walls
+    renderer = world.renderer
+    tile_count = world.tile_count
+    wall_count = len(walls)
+    camera = Camera(SCREEN_WIDTH, SCREEN_HEIGHT, world.tilemap.width * TILE_SIZE, world.tilemap.height * TILE_SIZE)
+    player = Player(*world.level.spawn)
+    dirty.invalidate_all()
+    levels.preload(following)
 
-# Processar o mapa
-walls = process_map_for_collision(map_data)
-tiles = process_map_for_rendering(map_data)
+start_level(world.name)
 
-# Criar o jogador
-player = Player(5, 5)
+# HUD de debug: a fonte é carregada uma vez e cada linha só é renderizada quando muda
+text_cache = TextCache()
+debug_texts = [
+    HudText(text_cache, "Posição: ({}, {})", WHITE, (10, 10)),
+    HudText(text_cache, "Tiles renderizados: {}", WHITE, (10, 35)),
+    HudText(text_cache, "Tiles colidíveis: {}", WHITE, (10, 60)),
+    HudText(text_cache, "Setas/WASD: mover | N: próxima fase | F3: perfil | ESC: sair", WHITE, (10, 85)),
+    HudText(text_cache, "Fase: {}", WHITE, (10, 110)),
+]
 
 # Game loop
+timestep = FixedTimestep(SIMULATION_RATE)
 running = True
 while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-        elif event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_ESCAPE:
+    # Tempo real do frame vai para o acumulador do passo fixo
+    dt = clock.tick(MAX_FPS)
+    steps = timestep.advance(dt)
+    
+    with profiler.section('eventos'):
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
                 running = False
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    running = False
+                elif event.key == pygame.K_n:
+                    start_level(levels.next_name())
+                elif event.key == pygame.K_F3:
+                    profiler.toggle()
+                elif event.key == pygame.K_F4:
+                    profiler.dump('profile_trace.csv')
     
-    player.update(walls)
+    with profiler.section('update'):
+        for _ in range(steps):
+            player.update(walls)
+        alpha = timestep.alpha
+        camera.follow(player.render_rect(alpha))
+        if WORLD_STREAMING:
+            renderer.update(camera.rect)
+        # Tiles animados da fase: só as células visíveis com quadro novo
+        world.animations.advance(dt)
+        # (no modo 'flip' a tela toda é redesenhada, não há áreas a marcar)
+        for rect in renderer.update_animations(camera.rect):
+            if RENDER_MODE == 'dirty':
+                dirty.invalidate_world(rect)
+        # Termina (na thread principal) a fase que carrega em segundo plano
+        levels.poll()
     
     # Renderização
-    screen.fill(BLACK)
-    
-    # Desenhar tiles - agora com spritesheet e ordem correta
-    for tile in tiles:
-        if tile['image']:
-            screen.blit(tile['image'], (tile['rect'].x, tile['rect'].y))
+    with profiler.section('tiles'):
+        if RENDER_MODE == 'dirty':
+            dirty.begin(camera)
         else:
-            pygame.draw.rect(screen, tile['color'], tile['rect'])
+            draw_world(screen, camera)
     
-    # Desenhar paredes (debug) - opcional
-    for wall in walls:
-        pygame.draw.rect(screen, RED, wall['rect'], 1)
-    
-    player.draw(screen)
+    player.draw(screen, camera, alpha)
     
     # Debug info
-    font = pygame.font.SysFont(None, 24)
-    debug_info = [
-        f"Posição: ({player.rect.x}, {player.rect.y})",
-        f"Tiles renderizados: {len(tiles)}",
-        f"Tiles colidíveis: {len(walls)}",
-        "Setas/WASD: mover | ESC: sair"
-    ]
+    debug_texts[0].set(player.rect.x, player.rect.y)
+    debug_texts[1].set(tile_count)
+    debug_texts[2].set(wall_count)
+    debug_texts[4].set(world.name)
+    for text in debug_texts:
+        text.draw(screen)
     
-    for i, text in enumerate(debug_info):
-        text_surface = font.render(text, True, WHITE)
-        screen.blit(text_surface, (10, 10 + i * 25))
-    
-    pygame.display.flip()
-    clock.tick(60)
+    overlay = profiler.draw(screen, (max(SCREEN_WIDTH - 310, 0), 10))
+    with profiler.section('flip'):
+        if RENDER_MODE == 'dirty':
+            dirty.mark(camera.apply(player.render_rect(alpha)))
+            for text in debug_texts:
+                dirty.mark(text.rect)
+            if overlay:
+                dirty.mark(overlay)
+            dirty.end()
+        else:
+            pygame.display.flip()
+    profiler.end_frame()
 
 pygame.quit()
\ No newline at end of file
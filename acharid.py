@@ -1,4 +1,7 @@
 import pygame
+from collections import OrderedDict
+
+from engine.tileset import load_tileset
 
 pygame.init()
 screen = pygame.display.set_mode((800, 600))
@@ -14,10 +17,49 @@ offset_x, offset_y = 0, 0
 dragging = False
 last_mouse_pos = (0, 0)
 selected_tile = None
+t = 16 # altere conforme o tamanho do tile
+
+# Grade da spritesheet: a mesma conta que o jogo usa para achar a posição de
+# cada id (o .tileset.json ao lado da folha pode mudar o tamanho do tile)
+tileset = load_tileset('spritesheet.png', t)
+t = tileset.tile_size
+
+# Cache por nível de zoom: a folha escalada e a grade já desenhada.
+# O zoom anda em passos de ZOOM_STEP, então cada nível é gerado uma vez e os
+# MAX_ZOOM_LEVELS usados mais recentemente ficam guardados (LRU).
+ZOOM_STEP = 0.1
+MAX_ZOOM_LEVELS = 8
+zoom_cache = OrderedDict()  # nível -> (folha escalada, grade)
+
+def get_zoom_level(zoom):
+    level = round(zoom / ZOOM_STEP)
+    if level in zoom_cache:
+        zoom_cache.move_to_end(level)
+        return zoom_cache[level]
+    
+    width = int(spritesheet_rect.width * zoom)
+    height = int(spritesheet_rect.height * zoom)
+    scaled_sheet = pygame.transform.scale(spritesheet, (width, height))
+    
+    # Grade numa superfície transparente (colorkey preto), desenhada uma vez
+    grid = pygame.Surface((width + 1, height + 1))
+    grid.set_colorkey((0, 0, 0))
+    for x in range(0, width, int(t * zoom)):
+        pygame.draw.line(grid, (255, 255, 255, 100), (x, 0), (x, spritesheet_rect.height * zoom), 1)
+    for y in range(0, height, int(t * zoom)):
+        pygame.draw.line(grid, (255, 255, 255, 100), (0, y), (spritesheet_rect.width * zoom, y), 1)
+    
+    zoom_cache[level] = (scaled_sheet, grid)
+    if len(zoom_cache) > MAX_ZOOM_LEVELS:
+        zoom_cache.popitem(last=False)
+    return zoom_cache[level]
 
 running = True
+needs_redraw = True
 while running:
-    for event in pygame.event.get():
+    # Sem eventos não há o que redesenhar: espera parado (CPU quase zero)
+    events = [pygame.event.wait()] + pygame.event.get()
+    for event in events:
         if event.type == pygame.QUIT:
             running = False
         
@@ -25,16 +67,21 @@ while running:
             if event.button == 1:  # Botão esquerdo
                 mouse_x, mouse_y = event.pos
                 # Calcula a posição na spritesheet considerando o zoom e offset
-                tile_x = (mouse_x - offset_x) // (16 * zoom)
-                tile_y = (mouse_y - offset_y) // (16 * zoom)
-                if 0 <= tile_x < (spritesheet_rect.width // 16) and 0 <= tile_y < (spritesheet_rect.height // 16):
-                    selected_tile = (tile_x * 16, tile_y * 16)
-                    print(f"Tile selecionado: ({selected_tile[0]}, {selected_tile[1]}) - ID sugerido: {tile_y * (spritesheet_rect.width // 16) + tile_x}")
+                tile_x = (mouse_x - offset_x) // (t * zoom)
+                tile_y = (mouse_y - offset_y) // (t * zoom)
+                if 0 <= tile_x < (spritesheet_rect.width // t) and 0 <= tile_y < (spritesheet_rect.height // t):
+                    selected_tile = (tile_x * t, tile_y * t)
+                    # O jogo já calcula a posição pelo id; só ids fora da
+                    # conta precisam ir para o .tileset.json
+                    print(f"Tile selecionado: ({selected_tile[0]}, {selected_tile[1]}) - ID: {tileset.id_at(int(selected_tile[0]), int(selected_tile[1]))}")
+                    needs_redraw = True
             
             elif event.button == 4:  # Roda do mouse para cima
-                zoom = min(zoom + 0.1, 5)
+                zoom = round(min(zoom + ZOOM_STEP, 5) / ZOOM_STEP) * ZOOM_STEP
+                needs_redraw = True
             elif event.button == 5:  # Roda do mouse para baixo
-                zoom = max(zoom - 0.1, 1)
+                zoom = round(max(zoom - ZOOM_STEP, 1) / ZOOM_STEP) * ZOOM_STEP
+                needs_redraw = True
         
         elif event.type == pygame.MOUSEMOTION:
             if dragging:
@@ -44,32 +91,30 @@ while running:
                 offset_x += dx
                 offset_y += dy
                 last_mouse_pos = (mouse_x, mouse_y)
+                needs_redraw = True
         
         elif event.type == pygame.MOUSEBUTTONUP:
             dragging = False
+        
+        elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWRESTORED):
+            needs_redraw = True
     
-    # Desenha a spritesheet com zoom
-    scaled_sheet = pygame.transform.scale(
-        spritesheet, 
-        (int(spritesheet_rect.width * zoom), int(spritesheet_rect.height * zoom))
-    )
+    if not running or not needs_redraw:
+        continue
+    needs_redraw = False
+    
+    # Desenha a spritesheet com zoom e a grade (ambas em cache)
+    scaled_sheet, grid = get_zoom_level(zoom)
     screen.fill((40, 40, 40))
     screen.blit(scaled_sheet, (offset_x, offset_y))
-    
-    # Desenha grade
-    for x in range(0, int(spritesheet_rect.width * zoom), int(16 * zoom)):
-        pygame.draw.line(screen, (255, 255, 255, 100), (x + offset_x, offset_y), 
-                         (x + offset_x, offset_y + spritesheet_rect.height * zoom), 1)
-    for y in range(0, int(spritesheet_rect.height * zoom), int(16 * zoom)):
-        pygame.draw.line(screen, (255, 255, 255, 100), (offset_x, y + offset_y), 
-                         (offset_x + spritesheet_rect.width * zoom, y + offset_y), 1)
+    screen.blit(grid, (offset_x, offset_y))
     
     # Destaca tile selecionado
     if selected_tile:
         highlight_rect = pygame.Rect(
             selected_tile[0] * zoom + offset_x,
             selected_tile[1] * zoom + offset_y,
-            16 * zoom, 16 * zoom)
+            t * zoom, t * zoom)
         pygame.draw.rect(screen, (255, 255, 0), highlight_rect, 2)
     
     pygame.display.flip()
@@ -0,0 +1,347 @@
+# Benchmark do game loop sem janela (driver de vídeo "dummy" do SDL)
+#
+# Roda N frames sem limite de FPS, com uma sequência fixa de teclas, sobre os
+# mapas do repositório e sobre mapas sintéticos do tamanho pedido, e mostra o
+# tempo de cada fase (carga, update, render e flip) com média e percentis.
+# Cada frame é o Game.frame() de engine/game.py, o mesmo do main.py (itens,
+# HUD, retângulos sujos, perfil e passo fixo), com um passo de simulação por
+# frame. Os mapas do repositório usam a spritesheet deles, pelo atlas.
+# A carga inclui ler o mapa, a spritesheet e o atlas (só nos mapas do
+# repositório), montar o índice de colisão e o renderizador.
+#
+#   python bench.py
+#   python bench.py --frames 600 --sizes 64 256 1024 --json resultado.json
+#   python bench.py --min-fps 200   (sai com erro se algum mapa ficar abaixo)
+#   python bench.py --check-dirty   (sai com erro se o modo 'dirty' desenhar
+#                                    diferente de um redesenho completo)
+#
+# Também roda só a simulação (passos fixos de 1/60 s, sem desenhar) para
+# medir quantas vezes mais rápido que o tempo real ela consegue andar, e
+# mede o passo de um lote de entidades (EntityBatch) contra o mapa de bits de
+# colisão de cada mapa (precisa do NumPy; --entities 0 desliga).
+#
+# Os mapas sintéticos têm tiles animados (GENERATED_ANIMATIONS); os do
+# repositório só se a spritesheet deles declarar animações no .tileset.json.
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from engine.animation import Animation, TileAnimations
+from engine.atlas import load_atlas
+from engine.collision import build_collision_index
+from engine.entities import EntityBatch
+from engine.game import Game, Player
+from engine.mapfile import load_map
+from engine.spritesheet import SpriteSheet
+from engine.tilemap import TileMap, TileTable
+from engine.tileset import load_tileset
+
+SIMULATION_RATE = 60
+
+# Mapas do repositório: spritesheet de cada um, onde o jogador começa (em
+# tiles) e a ordem das camadas, como nos scripts do jogo (main.py, main2.py
+# e main3.py). Camadas fora da ordem são desenhadas por cima, na ordem do JSON.
+MAP_FIXTURES = ['map.json', 'Tiny_Swords-ok/map.json', 'Tiny_Swords-certo/map.json']
+FIXTURE_SETUP = {
+    'map.json': ('spritesheet.png', (10, 10),
+                 ['Floor', 'Walls', 'Walls sides', 'Walls pillars', 'Doors', 'Traps', 'Miscs',
+                  'Gargoyles', 'Pickups']),
+    'Tiny_Swords-ok/map.json': ('Tiny_Swords-ok/spritesheet.png', (5, 5),
+                                ['Background', 'Sand', 'Grass', 'Rocks', 'Small rocks', 'Stairs', 'Cliff',
+                                 'Buildings']),
+    'Tiny_Swords-certo/map.json': ('Tiny_Swords-certo/spritesheet.png', (5, 5),
+                                   ['Background', 'Sand', 'pedras_para_preencher_vazio', 'Grass', 'Rocks',
+                                    'Small rocks', 'Stairs', 'Cliff', 'Buildings', 'escadas']),
+}
+# Camadas do mapa sintético, do fundo para a frente
+GENERATED_LAYER_ORDER = ['Floor', 'Walls', 'Miscs']
+
+# Sequência de teclas: (quantidade de frames, teclas pressionadas)
+INPUT_SCRIPT = [
+    (60, [pygame.K_RIGHT]),
+    (60, [pygame.K_DOWN]),
+    (30, [pygame.K_RIGHT, pygame.K_DOWN]),
+    (60, [pygame.K_LEFT]),
+    (60, [pygame.K_UP]),
+    (20, []),
+]
+
+
+# Substitui pygame.key.get_pressed() com as teclas do roteiro
+class ScriptedInput:
+    def __init__(self, script):
+        self.frames = []
+        for count, keys in script:
+            self.frames.extend([frozenset(keys)] * count)
+        self.frame = 0
+
+    def next_frame(self):
+        self.frame += 1
+
+    def __getitem__(self, key):
+        return key in self.frames[self.frame % len(self.frames)]
+
+
+# Gera um mapa sintético: chão completo, borda de paredes colisoras,
+# pedras espalhadas e uma camada de decoração esparsa
+def generate_map(width, height, tile_size=16, seed=0):
+    rnd = random.Random(seed)
+    tilemap = TileMap(tile_size, width, height)
+    floor = tilemap.add_layer('Floor')
+    walls = tilemap.add_layer('Walls', collider=True)
+    decor = tilemap.add_layer('Miscs')
+    for ty in range(height):
+        for tx in range(width):
+            floor.set(tx, ty, rnd.randrange(4))
+            if tx in (0, width - 1) or ty in (0, height - 1):
+                walls.set(tx, ty, 4)
+            elif rnd.random() < 0.03 and (tx > 4 or ty > 4):
+                walls.set(tx, ty, 5 + rnd.randrange(3))
+            elif rnd.random() < 0.05:
+                decor.set(tx, ty, 8 + rnd.randrange(8))
+    return tilemap
+
+
+# Tiles animados do mapa sintético: duas decorações que trocam de quadro
+# entre si (mede o redesenho das células animadas sem mexer no jogo)
+GENERATED_ANIMATIONS = {
+    8: Animation([8, 9], 200),
+    9: Animation([9, 8], 200),
+}
+
+
+# Spritesheet gerada em memória: 16 tiles de cores diferentes
+def generate_spritesheet(tile_size):
+    sheet = pygame.Surface((tile_size * 4, tile_size * 4), pygame.SRCALPHA)
+    rnd = random.Random(1)
+    mapping = {}
+    for tile_id in range(16):
+        x, y = (tile_id % 4) * tile_size, (tile_id // 4) * tile_size
+        sheet.fill((rnd.randrange(256), rnd.randrange(256), rnd.randrange(256)), (x, y, tile_size, tile_size))
+        mapping[str(tile_id)] = (x, y)
+    return SpriteSheet.from_surface(sheet.convert_alpha()), mapping
+
+
+# Mapa do repositório com a spritesheet dele, como o main.py carrega: posições
+# pela grade da folha (e o .tileset.json), atlas só com os ids usados
+def load_fixture(path):
+    tilemap = load_map(path)
+    sheet_path = FIXTURE_SETUP.get(path, (os.path.join(os.path.dirname(path), 'spritesheet.png'),))[0]
+    tileset = load_tileset(sheet_path, tilemap.tile_size)
+    spritesheet, atlas_mapping = load_atlas(sheet_path, tileset.mapping(tilemap.used_ids()), tilemap.tile_size)
+    if not spritesheet.sheet:
+        spritesheet = None
+    return tilemap, spritesheet, atlas_mapping, tileset.animations
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(int(round(p / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def summarize(samples):
+    total = sum(samples)
+    return {
+        'mean_ms': total / len(samples) * 1000,
+        'p50_ms': percentile(samples, 50) * 1000,
+        'p95_ms': percentile(samples, 95) * 1000,
+        'p99_ms': percentile(samples, 99) * 1000,
+        'max_ms': max(samples) * 1000,
+    }
+
+
+# Roda só a simulação, sem desenhar nada, e devolve passos por segundo
+def run_simulation(game, steps, spawn):
+    player = Player(spawn[0], spawn[1], game.tilemap.tile_size)
+    keys = ScriptedInput(INPUT_SCRIPT)
+    start = time.perf_counter()
+    for _ in range(steps):
+        player.update(game.walls, game.pickups, keys, game.profiler)
+        keys.next_frame()
+    return steps / (time.perf_counter() - start)
+
+
+# Passo de um lote de entidades andando e batendo nas paredes do mapa.
+# Devolve o tempo médio por passo, em segundos.
+def run_entities(tilemap, count, steps=120):
+    size = tilemap.tile_size
+    walls = build_collision_index(tilemap, 'bitmap')
+    rng = np.random.default_rng(1)
+    # Nascem em posições livres, com até meio tile por passo em cada eixo
+    xs = rng.uniform(0, tilemap.width * size - size, count * 2)
+    ys = rng.uniform(0, tilemap.height * size - size, count * 2)
+    free = ~walls.collides_many(np.floor(xs), np.floor(ys), [size // 2] * len(xs), [size // 2] * len(ys))
+    xs, ys = xs[free][:count], ys[free][:count]
+    entities = EntityBatch(size, capacity=len(xs), bounce=True)
+    entities.spawn_many(xs, ys, size // 2, size // 2,
+                        rng.uniform(-size / 2, size / 2, len(xs)),
+                        rng.uniform(-size / 2, size / 2, len(xs)))
+    start = time.perf_counter()
+    for _ in range(steps):
+        entities.update(walls)
+    return (time.perf_counter() - start) / steps, len(entities)
+
+
+def run_benchmark(name, load, frames, screen_size, sim_steps=0, entity_count=0, render_mode='dirty',
+                  spawn=(2, 2), check_dirty=False, layer_order=()):
+    start = time.perf_counter()
+    tilemap, spritesheet, mapping, animations = load()
+    world_width = tilemap.width * tilemap.tile_size
+    world_height = tilemap.height * tilemap.tile_size
+    screen = pygame.display.set_mode((min(world_width, screen_size[0]), min(world_height, screen_size[1])))
+    animations = TileAnimations(animations)
+    table = TileTable(spritesheet, mapping, tilemap.tile_size, animations=animations)
+    game = Game(screen, tilemap, table, layer_order, animations=animations, spawn=spawn,
+                render_mode=render_mode, simulation_rate=SIMULATION_RATE)
+    load_time = time.perf_counter() - start
+
+    keys = ScriptedInput(INPUT_SCRIPT)
+    # Um passo de simulação por frame, para o roteiro andar igual em qualquer FPS
+    dt = game.timestep.step_ms
+    phases = {'update': [], 'render': [], 'flip': [], 'frame': []}
+    blits = collision_tests = 0
+    mismatch = 0
+    for _ in range(frames):
+        t0 = time.perf_counter()
+        pygame.event.pump()
+        game.frame(dt, keys)
+        keys.next_frame()
+        frame_time = time.perf_counter() - t0
+        row = game.profiler.trace[-1]
+        update = row.get('update_ms', 0.0) / 1000
+        flip = row.get('flip_ms', 0.0) / 1000
+        phases['update'].append(update)
+        phases['render'].append(max(frame_time - update - flip, 0.0))
+        phases['flip'].append(flip)
+        phases['frame'].append(frame_time)
+        blits += row.get('blits', 0)
+        collision_tests += row.get('colisões', 0)
+        # Fora da medição (e dos contadores): fundo incremental contra um
+        # redesenho completo
+        if check_dirty and render_mode == 'dirty':
+            game.profiler.enabled = False
+            mismatch = max(mismatch, game.dirty.mismatch(game.camera))
+            game.profiler.enabled = True
+
+    result = {
+        'map': name,
+        'size': [tilemap.width, tilemap.height],
+        'frames': frames,
+        'load_ms': load_time * 1000,
+        'fps': frames / sum(phases['frame']),
+        'blits_per_frame': blits / frames,
+        'collision_tests_per_frame': collision_tests / frames,
+    }
+    if check_dirty and render_mode == 'dirty':
+        result['dirty_mismatch_px'] = mismatch
+    if sim_steps:
+        steps_per_second = run_simulation(game, sim_steps, spawn)
+        result['sim_steps_per_second'] = steps_per_second
+        result['sim_realtime_factor'] = steps_per_second / SIMULATION_RATE
+    if entity_count and np is not None:
+        step_time, spawned = run_entities(tilemap, entity_count)
+        result['entities'] = spawned
+        result['entity_step_ms'] = step_time * 1000
+    for phase, samples in phases.items():
+        result[phase] = summarize(samples)
+    return result
+
+
+def print_result(result):
+    print(f"{result['map']} ({result['size'][0]}x{result['size'][1]}): "
+          f"carga {result['load_ms']:.1f} ms, {result['fps']:.0f} fps, "
+          f"{result['blits_per_frame']:.1f} blits/frame, "
+          f"{result['collision_tests_per_frame']:.1f} testes de colisão/frame")
+    if 'dirty_mismatch_px' in result:
+        status = 'igual ao redesenho completo' if not result['dirty_mismatch_px'] else \
+            f"{result['dirty_mismatch_px']} pixels diferentes do redesenho completo"
+        print(f"    modo dirty: {status}")
+    if 'sim_steps_per_second' in result:
+        print(f"    simulação {result['sim_steps_per_second']:.0f} passos/s "
+              f"({result['sim_realtime_factor']:.0f}x o tempo real)")
+    if 'entity_step_ms' in result:
+        print(f"    {result['entities']} entidades: {result['entity_step_ms']:.3f} ms/passo "
+              f"(orçamento a {SIMULATION_RATE} Hz: {1000 / SIMULATION_RATE:.1f} ms)")
+    for phase in ('update', 'render', 'flip', 'frame'):
+        stats = result[phase]
+        print(f"    {phase:<7} média {stats['mean_ms']:.3f}  p50 {stats['p50_ms']:.3f}  "
+              f"p95 {stats['p95_ms']:.3f}  p99 {stats['p99_ms']:.3f}  máx {stats['max_ms']:.3f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do game loop sem janela")
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--sizes', type=int, nargs='*', default=[64, 256, 1024],
+                        help="lados dos mapas sintéticos (em tiles)")
+    parser.add_argument('--maps', nargs='*', default=MAP_FIXTURES)
+    parser.add_argument('--screen', type=int, nargs=2, default=[1280, 720])
+    parser.add_argument('--sim-steps', type=int, default=6000,
+                        help="passos de simulação sem desenho (0 desliga)")
+    parser.add_argument('--entities', type=int, default=5000,
+                        help="entidades no teste do EntityBatch (0 desliga)")
+    parser.add_argument('--render-mode', choices=['dirty', 'flip'], default='dirty',
+                        help="modo de renderização do Game (o do main.py é 'dirty')")
+    parser.add_argument('--check-dirty', action='store_true',
+                        help="compara o modo 'dirty' com um redesenho completo a cada frame")
+    parser.add_argument('--json', help="salva os resultados neste arquivo")
+    parser.add_argument('--min-fps', type=float, help="falha se algum mapa ficar abaixo")
+    args = parser.parse_args(argv)
+
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+
+    fixtures = []
+    for path in args.maps:
+        if os.path.exists(path):
+            _, spawn, layer_order = FIXTURE_SETUP.get(path, (None, (2, 2), []))
+            fixtures.append((path, lambda path=path: load_fixture(path), spawn, layer_order))
+    for size in args.sizes:
+        # O mapa sintético é gerado fora da medição; a carga mede só a montagem
+        generated = (generate_map(size, size),) + generate_spritesheet(16) + (GENERATED_ANIMATIONS,)
+        fixtures.append((f'sintético {size}x{size}', lambda generated=generated: generated, (2, 2),
+                         GENERATED_LAYER_ORDER))
+
+    results = []
+    for name, load, spawn, layer_order in fixtures:
+        result = run_benchmark(name, load, args.frames, args.screen, args.sim_steps, args.entities,
+                               args.render_mode, spawn, args.check_dirty, layer_order)
+        print_result(result)
+        results.append(result)
+
+    pygame.quit()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    wrong = [r['map'] for r in results if r.get('dirty_mismatch_px')]
+    if wrong:
+        print(f"Modo dirty diferente do redesenho completo: {', '.join(wrong)}")
+        return 1
+
+    if args.min_fps is not None:
+        slow = [r['map'] for r in results if r['fps'] < args.min_fps]
+        if slow:
+            print(f"Abaixo de {args.min_fps} fps: {', '.join(slow)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1 @@
+# Módulos compartilhados pelos jogos (main.py, main2.py e main3.py)
@@ -0,0 +1,120 @@
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+
+# Tiles animados
+# Uma animação é uma lista de ids de quadros (tiles da mesma spritesheet)
+# com a duração de cada um, em milissegundos. Todas as instâncias de um id
+# animado usam o mesmo relógio e as mesmas imagens: por frame o quadro atual
+# é calculado uma vez por id (não por tile no mapa) e as imagens dos quadros
+# são as da TileTable, extraídas uma vez.
+#
+# No .tileset.json da spritesheet:
+#
+#   "animations": {"25": {"frames": [25, 26], "duration": 800}}
+#
+# duration pode ser um número (todos os quadros) ou uma lista por quadro.
+
+
+class Animation:
+    def __init__(self, frames, duration=100):
+        self.frames = [int(frame) for frame in frames]
+        if isinstance(duration, (int, float)):
+            duration = [duration] * len(self.frames)
+        self.ends = list(accumulate(duration))  # fim de cada quadro no ciclo
+        self.total = self.ends[-1]
+
+    # Índice do quadro no tempo dado (ms desde o início do relógio)
+    def frame_at(self, time):
+        return min(bisect_right(self.ends, time % self.total), len(self.frames) - 1)
+
+
+# Relógio compartilhado e quadro atual de cada id animado
+class TileAnimations:
+    def __init__(self, animations=None):
+        self.animations = dict(animations or {})  # id -> Animation
+        self.time = 0
+        self.frames = {tile_id: 0 for tile_id in self.animations}  # id -> índice do quadro atual
+
+    def __contains__(self, tile_id):
+        return tile_id in self.frames
+
+    def __len__(self):
+        return len(self.animations)
+
+    # Avança o relógio (em ms) e devolve os ids que trocaram de quadro
+    def advance(self, dt):
+        self.time += dt
+        changed = []
+        for tile_id, animation in self.animations.items():
+            frame = animation.frame_at(self.time)
+            if frame != self.frames[tile_id]:
+                self.frames[tile_id] = frame
+                changed.append(tile_id)
+        return changed
+
+    # Id do quadro que aparece agora no lugar de tile_id
+    def frame_id(self, tile_id):
+        return self.animations[tile_id].frames[self.frames[tile_id]]
+
+
+# Tiles de uma camada compacta com algum dos ids, como (id, tx, ty)
+# A busca procura os bytes do id (bytes.find), sem percorrer a grade em
+# Python; serve tanto para array quanto para o memoryview do mapa compilado.
+def find_tiles(layer, tile_ids):
+    view = memoryview(layer.ids)
+    size = view.itemsize
+    data = view.cast('B').tobytes()
+    for tile_id in tile_ids:
+        pattern = array(view.format, [tile_id]).tobytes()
+        pos = data.find(pattern)
+        while pos != -1:
+            if pos % size == 0:
+                i = pos // size
+                yield tile_id, i % layer.width, i // layer.width
+                pos = data.find(pattern, pos + size)
+            else:
+                pos = data.find(pattern, pos + 1)
+
+
+# Tiles animados de cada bloco do mapa (chunk ou região) e o quadro de cada
+# id que está desenhado na superfície do bloco
+# refresh() redesenha só as células dos ids cujo quadro mudou desde o último
+# desenho do bloco; um bloco que acabou de ser desenhado (ou lido do disco)
+# é atualizado inteiro na primeira vez.
+class AnimatedCells:
+    def __init__(self, animations):
+        self.animations = animations
+        self.cells = {}  # bloco -> {id: [retângulos nas coordenadas do compositor]}
+        self.drawn = {}  # bloco -> {id: índice do quadro desenhado}
+
+    def add(self, key, tile_id, rect):
+        self.cells.setdefault(key, {}).setdefault(tile_id, []).append(rect)
+
+    # A superfície do bloco foi (re)criada: os quadros nela são desconhecidos
+    def reset(self, key):
+        self.drawn.pop(key, None)
+
+    def forget(self, key):
+        self.cells.pop(key, None)
+        self.drawn.pop(key, None)
+
+    # Redesenha no compositor do bloco as células com quadro novo e devolve
+    # as áreas que mudaram, no mundo (offset: posição do compositor no mundo,
+    # quando ele usa coordenadas locais)
+    def refresh(self, key, compositor, offset=(0, 0)):
+        cells = self.cells.get(key)
+        if not cells or compositor.surface is None:
+            return []
+        drawn = self.drawn.setdefault(key, {})
+        frames = self.animations.frames
+        changed = []
+        for tile_id, rects in cells.items():
+            frame = frames[tile_id]
+            if drawn.get(tile_id) == frame:
+                continue
+            drawn[tile_id] = frame
+            for rect in rects:
+                compositor.redraw_area(rect)
+                changed.append(rect.move(offset))
+        return changed
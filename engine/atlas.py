@@ -0,0 +1,120 @@
+import hashlib
+import math
+import os
+import struct
+
+import pygame
+
+from engine.spritesheet import SpriteSheet
+
+# Atlas de texturas
+# Em vez de converter a spritesheet inteira, copia só as células usadas no
+# TILE_MAPPING para uma imagem pequena (grade quadrada, sem espaços) e
+# devolve um TILE_MAPPING reescrito para as posições no atlas. O atlas fica
+# salvo já decodificado (RGBA cru) em .cache/, com uma chave que muda quando
+# a spritesheet, o mapeamento ou o tamanho do tile mudam.
+#
+#   arquivo .atlas:  magic 'ATLS', versão, largura, altura, número de células,
+#                    uma linha (origem x, y -> destino x, y) por célula e os
+#                    pixels RGBA
+MAGIC = b'ATLS'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIII')
+ENTRY = struct.Struct('<iiII')
+
+
+def atlas_key(sheet_path, mapping, tile_size):
+    digest = hashlib.sha1()
+    with open(sheet_path, 'rb') as f:
+        digest.update(f.read())
+    cells = sorted(set(tuple(pos) for pos in mapping.values()))
+    digest.update(repr((tile_size, cells)).encode())
+    return digest.hexdigest()[:16]
+
+
+def atlas_path(sheet_path, key, cache_dir=None):
+    cache_dir = cache_dir or os.path.join(os.path.dirname(sheet_path), '.cache')
+    name = os.path.splitext(os.path.basename(sheet_path))[0]
+    return os.path.join(cache_dir, f'{name}.{key}.atlas')
+
+
+# Copia as células usadas para um atlas compacto
+# Devolve a superfície do atlas e {posição na folha: posição no atlas}
+def pack_cells(sheet, cells, tile_size):
+    cells = sorted(set(cells))
+    columns = max(1, math.ceil(math.sqrt(len(cells))))
+    rows = max(1, math.ceil(len(cells) / columns))
+    atlas = pygame.Surface((columns * tile_size, rows * tile_size), pygame.SRCALPHA)
+    placement = {}
+    for i, (x, y) in enumerate(cells):
+        dest = ((i % columns) * tile_size, (i // columns) * tile_size)
+        atlas.blit(sheet, dest, (x, y, tile_size, tile_size))
+        placement[(x, y)] = dest
+    return atlas, placement
+
+
+def write_atlas(path, atlas, placement):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, atlas.get_width(), atlas.get_height(), len(placement)))
+        for (x, y), (dx, dy) in placement.items():
+            f.write(ENTRY.pack(x, y, dx, dy))
+        f.write(pygame.image.tobytes(atlas, 'RGBA'))
+    os.replace(tmp_path, path)
+
+
+def read_atlas(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version, _, width, height, count = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        return None
+    placement = {}
+    pos = HEADER.size
+    for _ in range(count):
+        x, y, dx, dy = ENTRY.unpack_from(data, pos)
+        placement[(x, y)] = (dx, dy)
+        pos += ENTRY.size
+    atlas = pygame.image.frombytes(data[pos:pos + width * height * 4], (width, height), 'RGBA')
+    return atlas, placement
+
+
+# Carrega (ou monta na primeira vez) o atlas das células do mapeamento
+# Devolve a SpriteSheet do atlas e o mapeamento id -> posição no atlas. Se a
+# spritesheet não puder ser lida, devolve uma SpriteSheet vazia e o
+# mapeamento original, como SpriteSheet faria.
+# Com convert=False o atlas não é convertido para o formato da tela (para
+# carregar numa thread e chamar SpriteSheet.convert() na principal).
+def load_atlas(sheet_path, mapping, tile_size, cache_dir=None, convert=True):
+    try:
+        key = atlas_key(sheet_path, mapping, tile_size)
+    except OSError as e:
+        print(f"Erro ao carregar spritesheet: {e}")
+        return SpriteSheet.from_surface(None), mapping
+
+    path = atlas_path(sheet_path, key, cache_dir)
+    loaded = None
+    if os.path.exists(path):
+        try:
+            loaded = read_atlas(path)
+        except (OSError, ValueError, struct.error):
+            loaded = None
+
+    if loaded is None:
+        try:
+            sheet = pygame.image.load(sheet_path)
+        except pygame.error as e:
+            print(f"Erro ao carregar spritesheet: {e}")
+            return SpriteSheet.from_surface(None), mapping
+        loaded = pack_cells(sheet, [tuple(pos) for pos in mapping.values()], tile_size)
+        try:
+            write_atlas(path, *loaded)
+        except OSError as e:
+            print(f"Não foi possível salvar o atlas: {e}")
+
+    atlas, placement = loaded
+    if convert and pygame.display.get_surface() is not None:
+        atlas = atlas.convert_alpha()
+    atlas_mapping = {tile_id: placement[tuple(pos)] for tile_id, pos in mapping.items()}
+    return SpriteSheet.from_surface(atlas), atlas_mapping
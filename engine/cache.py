@@ -0,0 +1,156 @@
+import hashlib
+import os
+import queue
+import shutil
+import struct
+import threading
+import zlib
+
+import pygame
+
+# Cache em disco do mundo pré-processado
+# Tudo fica em .cache/ ao lado do mapa, em arquivos (ou pastas) cujo nome
+# leva uma chave calculada pelo conteúdo das entradas: o texto do map.json,
+# os bytes da spritesheet, o mapeamento de tiles e as opções de desenho. Se
+# qualquer entrada mudar a chave muda e o cache antigo simplesmente deixa de
+# ser usado (e é apagado quando um novo é criado).
+
+# Mude quando o formato ou o desenho dos chunks mudar
+BAKE_VERSION = 2
+
+_digests = {}  # caminho -> ((mtime, tamanho), sha1 do conteúdo)
+
+
+# sha1 do conteúdo de um arquivo; só relê o arquivo se ele mudou desde a
+# última vez nesta execução
+def file_digest(path):
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    cached = _digests.get(path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    value = digest.hexdigest()
+    _digests[path] = (stamp, value)
+    return value
+
+
+# Chave do conteúdo de alguns arquivos mais alguns valores (mapeamento,
+# cores...). Arquivos que não existem entram como ausentes.
+def content_key(paths, *values):
+    digest = hashlib.sha1()
+    for path in paths:
+        digest.update(file_digest(path).encode() if os.path.exists(path) else b'-')
+    digest.update(repr(values).encode())
+    return digest.hexdigest()[:16]
+
+
+def cache_dir_for(path):
+    return os.path.join(os.path.dirname(path), '.cache')
+
+
+# Apaga entradas antigas do mesmo arquivo de origem (nome.<outra chave>.sufixo)
+def remove_stale(cache_dir, name, suffix, keep):
+    if not os.path.isdir(cache_dir):
+        return
+    for entry in os.listdir(cache_dir):
+        parts = entry.split('.')
+        if len(parts) == 3 and parts[0] == name and parts[2] == suffix and parts[1] != keep:
+            path = os.path.join(cache_dir, entry)
+            try:
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+# Imagens de chunks já desenhadas (ChunkRenderer.use_baked)
+# Cada chunk vira um arquivo com os pixels RGB comprimidos com zlib, então
+# carregar é ler e descomprimir, sem desenhar tile por tile. A compressão e
+# a gravação rodam numa thread: save() só copia os pixels, e o frame que
+# desenhou o chunk pela primeira vez não espera o disco.
+#
+#   arquivo .chunk:  magic 'CHNK', largura, altura e os pixels RGB (zlib)
+class BakedChunks:
+    MAGIC = b'CHNK'
+    HEADER = struct.Struct('<4sII')
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.loaded = 0
+        self.saved = 0
+        self.writes = queue.Queue()
+        self.writer = None  # thread de gravação, criada no primeiro save()
+
+    # Pasta para um mapa, uma spritesheet, um mapeamento e as opções de desenho
+    @classmethod
+    def for_world(cls, map_path, sheet_path, mapping, *options):
+        key = content_key([map_path, sheet_path], BAKE_VERSION, sorted(mapping.items()), options)
+        cache_dir = cache_dir_for(map_path)
+        name = os.path.splitext(os.path.basename(map_path))[0]
+        remove_stale(cache_dir, name, 'chunks', key)
+        return cls(os.path.join(cache_dir, f'{name}.{key}.chunks'))
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key[0]}_{key[1]}.chunk')
+
+    def load(self, key, size):
+        try:
+            with open(self._path(key), 'rb') as f:
+                data = f.read()
+            magic, width, height = self.HEADER.unpack_from(data, 0)
+        except (OSError, struct.error):
+            return None
+        if magic != self.MAGIC or (width, height) != tuple(size):
+            return None
+        try:
+            pixels = zlib.decompress(data[self.HEADER.size:])
+        except zlib.error:
+            return None
+        if len(pixels) != width * height * 3:
+            return None
+        surface = pygame.image.frombytes(pixels, (width, height), 'RGB')
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+        self.loaded += 1
+        return surface
+
+    # Copia os pixels agora (a superfície pode mudar depois) e deixa o resto
+    # para a thread
+    def save(self, key, surface):
+        if self.writer is None:
+            self.writer = threading.Thread(target=self._worker, daemon=True)
+            self.writer.start()
+        self.writes.put((key, surface.get_size(), pygame.image.tobytes(surface, 'RGB')))
+
+    def _worker(self):
+        while True:
+            item = self.writes.get()
+            try:
+                self._write(*item)
+            finally:
+                self.writes.task_done()
+
+    def _write(self, key, size, pixels):
+        path = self._path(key)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            data = zlib.compress(pixels)
+            with open(path + '.tmp', 'wb') as f:
+                f.write(self.HEADER.pack(self.MAGIC, size[0], size[1]))
+                f.write(data)
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            print(f"Não foi possível salvar o chunk: {e}")
+            return
+        self.saved += 1
+
+    # Espera as gravações pendentes (ex.: antes de medir ou de sair)
+    def flush(self):
+        if self.writer is not None:
+            self.writes.join()
@@ -0,0 +1,326 @@
+import math
+
+import pygame
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Índice espacial em grade uniforme
+# Cada entrada (um dict com 'rect') é guardada nas células que o seu retângulo
+# ocupa. Uma consulta só olha as poucas células que o retângulo consultado
+# cobre, então o custo não depende do total de colisores do mapa.
+class SpatialGrid:
+    def __init__(self, cell_size, entries=()):
+        self.cell_size = cell_size
+        self.cells = {}  # (cx, cy) -> lista de entradas
+        self.count = 0
+        for entry in entries:
+            self.add(entry)
+
+    # Células (cx, cy) cobertas por um retângulo em pixels
+    def cells_in_rect(self, rect):
+        size = self.cell_size
+        for cy in range(rect.top // size, (rect.bottom - 1) // size + 1):
+            for cx in range(rect.left // size, (rect.right - 1) // size + 1):
+                yield (cx, cy)
+
+    def add(self, entry):
+        for key in self.cells_in_rect(entry['rect']):
+            self.cells.setdefault(key, []).append(entry)
+        self.count += 1
+
+    # Remove uma entrada (ex.: porta aberta, parede destruída)
+    def remove(self, entry):
+        for key in self.cells_in_rect(entry['rect']):
+            cell = self.cells.get(key)
+            if not cell:
+                continue
+            for i, other in enumerate(cell):
+                if other is entry:
+                    del cell[i]
+                    break
+            if not cell:
+                del self.cells[key]
+        self.count -= 1
+
+    # Entradas das células que o retângulo cobre (candidatas a colisão)
+    def query(self, rect):
+        found = []
+        seen = set()
+        for key in self.cells_in_rect(rect):
+            for entry in self.cells.get(key, ()):
+                if id(entry) not in seen:
+                    seen.add(id(entry))
+                    found.append(entry)
+        return found
+
+    def collides(self, rect):
+        for entry in self.query(rect):
+            if rect.colliderect(entry['rect']):
+                return True
+        return False
+
+    # Célula ocupada por alguma entrada. Com cell_size igual ao tamanho do
+    # tile e uma entrada por tile (como em build_collision_index) é exato.
+    def is_solid(self, cx, cy):
+        return (cx, cy) in self.cells
+
+    def sweep(self, rect, dx, dy):
+        return sweep_rect(rect, dx, dy, self.is_solid, self.cell_size)
+
+    # Mesma interface de CollisionBitmap.collides_many, um retângulo por vez
+    def collides_many(self, xs, ys, ws, hs):
+        return [self.collides(pygame.Rect(x, y, w, h)) for x, y, w, h in zip(xs, ys, ws, hs)]
+
+    def __iter__(self):
+        seen = set()
+        for cell in self.cells.values():
+            for entry in cell:
+                if id(entry) not in seen:
+                    seen.add(id(entry))
+                    yield entry
+
+    def __len__(self):
+        return self.count
+
+
+# Mapa de bits de colisão
+# Como todo colisor é um tile quadrado numa grade fixa, basta guardar um
+# booleano por célula (mapHeight x mapWidth, 1 byte por tile). Consultas de
+# ponto e de retângulo são O(1) em relação ao tamanho do mapa, e
+# collides_many testa muitas entidades de uma vez usando uma tabela de somas.
+# Sem NumPy a grade vira um bytearray e as consultas em lote são feitas em
+# Python puro.
+class CollisionBitmap:
+    def __init__(self, width, height, tile_size):
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        if np is not None:
+            self.grid = np.zeros((height, width), dtype=bool)
+        else:
+            self.grid = bytearray(width * height)
+        self._sums = None  # tabela de somas (integral), refeita sob demanda
+
+    def is_solid(self, tx, ty):
+        if not (0 <= tx < self.width and 0 <= ty < self.height):
+            return False
+        if np is not None:
+            return bool(self.grid[ty, tx])
+        return bool(self.grid[ty * self.width + tx])
+
+    def set_solid(self, tx, ty, solid=True):
+        if not (0 <= tx < self.width and 0 <= ty < self.height):
+            return
+        if np is not None:
+            self.grid[ty, tx] = solid
+        else:
+            self.grid[ty * self.width + tx] = 1 if solid else 0
+        self._sums = None
+
+    # Copia uma máscara pronta (1 byte por célula, linha a linha)
+    def load_mask(self, mask):
+        if np is not None:
+            self.grid[:] = np.frombuffer(bytes(mask), dtype=np.uint8).reshape(self.height, self.width) != 0
+        else:
+            self.grid[:] = mask
+        self._sums = None
+
+    def is_solid_point(self, px, py):
+        return self.is_solid(px // self.tile_size, py // self.tile_size)
+
+    def sweep(self, rect, dx, dy):
+        return sweep_rect(rect, dx, dy, self.is_solid, self.tile_size)
+
+    # Intervalo de células (já limitado ao mapa) coberto por um retângulo
+    def _cell_range(self, rect):
+        size = self.tile_size
+        x0 = max(rect.left // size, 0)
+        y0 = max(rect.top // size, 0)
+        x1 = min((rect.right - 1) // size, self.width - 1)
+        y1 = min((rect.bottom - 1) // size, self.height - 1)
+        return x0, y0, x1, y1
+
+    def collides(self, rect):
+        x0, y0, x1, y1 = self._cell_range(rect)
+        if x0 > x1 or y0 > y1:
+            return False
+        if np is not None:
+            return bool(self.grid[y0:y1 + 1, x0:x1 + 1].any())
+        for ty in range(y0, y1 + 1):
+            row = ty * self.width
+            if any(self.grid[row + x0:row + x1 + 1]):
+                return True
+        return False
+
+    # Tiles sólidos que o retângulo cobre, no mesmo formato das paredes
+    # ({'rect': ...}) para que o Player funcione com qualquer backend
+    def query(self, rect):
+        size = self.tile_size
+        x0, y0, x1, y1 = self._cell_range(rect)
+        found = []
+        for ty in range(y0, y1 + 1):
+            for tx in range(x0, x1 + 1):
+                if self.is_solid(tx, ty):
+                    found.append({'rect': pygame.Rect(tx * size, ty * size, size, size)})
+        return found
+
+    # Compatível com SpatialGrid.add/remove: marca as células do retângulo
+    def add(self, entry):
+        x0, y0, x1, y1 = self._cell_range(entry['rect'])
+        for ty in range(y0, y1 + 1):
+            for tx in range(x0, x1 + 1):
+                self.set_solid(tx, ty, True)
+
+    def remove(self, entry):
+        x0, y0, x1, y1 = self._cell_range(entry['rect'])
+        for ty in range(y0, y1 + 1):
+            for tx in range(x0, x1 + 1):
+                self.set_solid(tx, ty, False)
+
+    # Consulta em lote: xs, ys, ws, hs são sequências (ou arrays) em pixels.
+    # Devolve, para cada retângulo, se ele toca algum tile sólido.
+    def collides_many(self, xs, ys, ws, hs):
+        if np is None:
+            return [self.collides(pygame.Rect(x, y, w, h)) for x, y, w, h in zip(xs, ys, ws, hs)]
+
+        if self._sums is None:
+            sums = np.zeros((self.height + 1, self.width + 1), dtype=np.int32)
+            np.cumsum(np.cumsum(self.grid, axis=0, dtype=np.int32), axis=1, out=sums[1:, 1:])
+            self._sums = sums
+
+        xs = np.asarray(xs, dtype=np.int64)
+        ys = np.asarray(ys, dtype=np.int64)
+        size = self.tile_size
+        x0 = np.maximum(xs // size, 0)
+        y0 = np.maximum(ys // size, 0)
+        x1 = np.minimum((xs + np.asarray(ws) - 1) // size, self.width - 1)
+        y1 = np.minimum((ys + np.asarray(hs) - 1) // size, self.height - 1)
+        inside = (x0 <= x1) & (y0 <= y1)
+
+        # Limita os índices para não sair da tabela; os de fora são zerados
+        x0 = np.minimum(x0, self.width - 1)
+        y0 = np.minimum(y0, self.height - 1)
+        x1 = np.maximum(x1, 0)
+        y1 = np.maximum(y1, 0)
+        s = self._sums
+        total = s[y1 + 1, x1 + 1] - s[y0, x1 + 1] - s[y1 + 1, x0] + s[y0, x0]
+        return inside & (total > 0)
+
+    def __iter__(self):
+        size = self.tile_size
+        for ty in range(self.height):
+            for tx in range(self.width):
+                if self.is_solid(tx, ty):
+                    yield {'rect': pygame.Rect(tx * size, ty * size, size, size)}
+
+    def __len__(self):
+        if np is not None:
+            return int(self.grid.sum())
+        return sum(self.grid)
+
+
+# Varredura contínua (swept AABB) de um retângulo contra a grade de tiles
+# Em vez de mover o retângulo e depois procurar paredes, percorre (DDA) só as
+# colunas e linhas de tiles que a borda da frente atravessa no caminho de
+# (dx, dy), na ordem em que são atravessadas, e para no primeiro tile sólido.
+# O custo é proporcional à distância percorrida e não ao número de colisores,
+# e nenhuma velocidade atravessa paredes finas.
+# Devolve (t, normal, tested): t em [0, 1] é a fração do movimento até o
+# contato (1.0 se nada foi atingido), normal é a direção da face atingida,
+# por exemplo (-1, 0) ao bater andando para a direita, e tested é quantos
+# tiles foram consultados (para o contador de colisões do perfil).
+# Um retângulo que já começa dentro de uma parede (ex.: nasceu nela) anda
+# livre até sair, em vez de ficar preso.
+def sweep_rect(rect, dx, dy, is_solid, tile_size):
+    size = tile_size
+    # Células ocupadas agora: a borda da frente é acompanhada em inteiros e a
+    # de trás é recalculada a cada travessia
+    x0, x1 = rect.left // size, (rect.right - 1) // size
+    y0, y1 = rect.top // size, (rect.bottom - 1) // size
+    tested = 0
+    for ty in range(y0, y1 + 1):
+        for tx in range(x0, x1 + 1):
+            tested += 1
+            if is_solid(tx, ty):
+                return 1.0, (0, 0), tested
+
+    while True:
+        # Tempo até a borda da frente entrar na próxima coluna / linha
+        if dx > 0:
+            t_x = ((x1 + 1) * size - rect.right) / dx
+        elif dx < 0:
+            t_x = (x0 * size - rect.left) / dx
+        else:
+            t_x = math.inf
+        if dy > 0:
+            t_y = ((y1 + 1) * size - rect.bottom) / dy
+        elif dy < 0:
+            t_y = (y0 * size - rect.top) / dy
+        else:
+            t_y = math.inf
+
+        # Chegar exatamente na borda (t == 1) é encostar, não entrar
+        if min(t_x, t_y) >= 1:
+            return 1.0, (0, 0), tested
+
+        if t_x <= t_y:
+            t = t_x
+            # Linhas ocupadas no instante t (a da frente já está em y0/y1)
+            if dy > 0:
+                y0 = math.floor((rect.top + dy * t) / size)
+            elif dy < 0:
+                y1 = math.ceil((rect.bottom + dy * t) / size) - 1
+            column = x1 + 1 if dx > 0 else x0 - 1
+            for ty in range(y0, y1 + 1):
+                tested += 1
+                if is_solid(column, ty):
+                    return t, (-1 if dx > 0 else 1, 0), tested
+            if dx > 0:
+                x1 = column
+            else:
+                x0 = column
+        else:
+            t = t_y
+            if dx > 0:
+                x0 = math.floor((rect.left + dx * t) / size)
+            elif dx < 0:
+                x1 = math.ceil((rect.right + dx * t) / size) - 1
+            row = y1 + 1 if dy > 0 else y0 - 1
+            for tx in range(x0, x1 + 1):
+                tested += 1
+                if is_solid(tx, row):
+                    return t, (0, -1 if dy > 0 else 1), tested
+            if dy > 0:
+                y1 = row
+            else:
+                y0 = row
+
+
+# Cria o índice de colisão escolhido: 'grid' (SpatialGrid) ou 'bitmap'
+def create_collision_index(backend, map_width, map_height, tile_size):
+    if backend == 'grid':
+        return SpatialGrid(tile_size)
+    if backend == 'bitmap':
+        return CollisionBitmap(map_width, map_height, tile_size)
+    raise ValueError(f"Backend de colisão desconhecido: {backend}")
+
+
+# Monta o índice de colisão direto das camadas colisoras de um TileMap
+def build_collision_index(tilemap, backend='grid'):
+    walls = create_collision_index(backend, tilemap.width, tilemap.height, tilemap.tile_size)
+    if isinstance(walls, CollisionBitmap) and tilemap.collider_mask is not None:
+        walls.load_mask(tilemap.collider_mask)
+        return walls
+    for layer in tilemap.layers:
+        if not layer.collider:
+            continue
+        for tx, ty, _ in layer.tiles():
+            if isinstance(walls, CollisionBitmap):
+                walls.set_solid(tx, ty)
+            else:
+                walls.add({'rect': tilemap.tile_rect(tx, ty), 'layer': layer.name})
+    return walls
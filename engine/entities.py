@@ -0,0 +1,165 @@
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Lote de entidades (inimigos, NPCs, projéteis) guardado em arrays NumPy
+# Posição, velocidade e tamanho de todas as entidades ficam em arrays
+# contíguos, um por campo, e o movimento e a colisão com os tiles são feitos
+# para o lote inteiro de uma vez, sem laço Python por entidade. A colisão usa
+# o mesmo índice de build_collision_index; com o backend 'bitmap' ela também
+# é vetorizada (collides_many), com 'grid' vira um laço por entidade.
+# As posições são em pixels (float) e as velocidades em pixels por passo.
+class EntityBatch:
+    def __init__(self, tile_size, capacity=1024, bounce=False):
+        if np is None:
+            raise ImportError("EntityBatch precisa do NumPy")
+        self.tile_size = tile_size
+        self.bounce = bounce  # ao bater: inverte a velocidade (True) ou para (False)
+        self.count = 0
+        self.next_id = 0
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.vx = np.zeros(capacity)
+        self.vy = np.zeros(capacity)
+        self.w = np.zeros(capacity, dtype=np.int64)
+        self.h = np.zeros(capacity, dtype=np.int64)
+        self.kind = np.zeros(capacity, dtype=np.int32)
+        self.ids = np.zeros(capacity, dtype=np.int64)  # id estável de cada entidade
+
+    FIELDS = ('x', 'y', 'vx', 'vy', 'w', 'h', 'kind', 'ids')
+
+    # Dobra a capacidade dos arrays quando o lote enche
+    def _grow(self, needed):
+        capacity = len(self.x)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for field in self.FIELDS:
+            old = getattr(self, field)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, field, new)
+
+    # Cria uma entidade e devolve o id estável dela
+    def spawn(self, x, y, w, h, vx=0.0, vy=0.0, kind=0):
+        self._grow(self.count + 1)
+        i = self.count
+        self.x[i], self.y[i], self.vx[i], self.vy[i] = x, y, vx, vy
+        self.w[i], self.h[i], self.kind[i] = w, h, kind
+        self.ids[i] = self.next_id
+        self.next_id += 1
+        self.count += 1
+        return int(self.ids[i])
+
+    # Cria várias entidades de uma vez a partir de arrays (ou escalares)
+    def spawn_many(self, x, y, w, h, vx=0.0, vy=0.0, kind=0):
+        x = np.atleast_1d(np.asarray(x, dtype=float))
+        n = len(x)
+        self._grow(self.count + n)
+        s = slice(self.count, self.count + n)
+        self.x[s], self.y[s], self.vx[s], self.vy[s] = x, y, vx, vy
+        self.w[s], self.h[s], self.kind[s] = w, h, kind
+        self.ids[s] = np.arange(self.next_id, self.next_id + n)
+        self.next_id += n
+        self.count += n
+        return self.ids[s].copy()
+
+    # Remove as entidades marcadas (array booleano do tamanho do lote),
+    # compactando os arrays; a ordem das que ficam é mantida
+    def despawn(self, mask):
+        keep = ~np.asarray(mask, dtype=bool)
+        n = int(keep.sum())
+        for field in self.FIELDS:
+            array = getattr(self, field)
+            array[:n] = array[:self.count][keep]
+        self.count = n
+
+    # Movimento de um passo com colisão contra os tiles sólidos de walls.
+    # Cada eixo é resolvido separadamente (desliza nas paredes) e o passo é
+    # dividido em subpassos de no máximo um tile, para nenhuma entidade
+    # rápida atravessar paredes. Devolve o array booleano das que bateram.
+    def update(self, walls, dt=1.0):
+        n = self.count
+        hit = np.zeros(n, dtype=bool)
+        if n == 0:
+            return hit
+        size = self.tile_size
+        fastest = max(np.abs(self.vx[:n]).max(), np.abs(self.vy[:n]).max()) * dt
+        substeps = max(1, math.ceil(fastest / size))
+        step = dt / substeps
+        w, h = self.w[:n], self.h[:n]
+        for _ in range(substeps):
+            self._move_axis(walls, self.x[:n], self.vx[:n], w, step, hit, True)
+            self._move_axis(walls, self.y[:n], self.vy[:n], h, step, hit, False)
+        return hit
+
+    # Colisão das entidades idx com pos no lugar da coordenada do eixo
+    def _collides(self, walls, idx, pos, horizontal):
+        xs = pos if horizontal else self.x[idx]
+        ys = self.y[idx] if horizontal else pos
+        return np.asarray(walls.collides_many(np.floor(xs).astype(np.int64),
+                                              np.floor(ys).astype(np.int64),
+                                              self.w[idx], self.h[idx]), dtype=bool)
+
+    def _move_axis(self, walls, pos, vel, extent, step, hit, horizontal):
+        moving = np.nonzero(vel)[0]
+        if len(moving) == 0:
+            return
+        old = pos[moving]
+        pos[moving] += vel[moving] * step
+        blocked = self._collides(walls, moving, pos[moving], horizontal)
+        if not blocked.any():
+            return
+        idx = moving[blocked]
+        old = old[blocked]
+        # Só é barrado quem estava livre antes do passo; quem já estava dentro
+        # de uma parede (ex.: nasceu nela) anda livre até sair, como em sweep_rect
+        was_free = ~self._collides(walls, idx, old, horizontal)
+        idx, old = idx[was_free], old[was_free]
+        if len(idx) == 0:
+            return
+
+        # Encosta na face do tile atingido: com subpassos de até um tile a
+        # borda da frente entrou em no máximo uma coluna (ou linha) nova
+        size = self.tile_size
+        lead = np.floor(pos[idx]).astype(np.int64)
+        pos[idx] = np.where(vel[idx] > 0,
+                            (lead + extent[idx] - 1) // size * size - extent[idx],
+                            (lead // size + 1) * size)
+        # Se ainda assim colidir (encostou na quina de outro tile), volta
+        again = self._collides(walls, idx, pos[idx], horizontal)
+        pos[idx[again]] = old[again]
+
+        if self.bounce:
+            vel[idx] = -vel[idx]
+        else:
+            vel[idx] = 0
+        hit[idx] = True
+
+    # Índices das entidades que tocam um retângulo (ex.: a área da câmera)
+    def in_rect(self, rect):
+        n = self.count
+        x, y = self.x[:n], self.y[:n]
+        inside = ((x + self.w[:n] > rect.left) & (x < rect.right) &
+                  (y + self.h[:n] > rect.top) & (y < rect.bottom))
+        return np.nonzero(inside)[0]
+
+    # Desenha as entidades visíveis numa chamada só de blits.
+    # images é uma lista de superfícies indexada por kind.
+    def draw(self, surface, camera, images):
+        visible = self.in_rect(camera.rect)
+        if len(visible) == 0:
+            return 0
+        xs = (np.floor(self.x[visible]) - camera.rect.x).astype(int).tolist()
+        ys = (np.floor(self.y[visible]) - camera.rect.y).astype(int).tolist()
+        kinds = self.kind[visible].tolist()
+        surface.blits([(images[k], (x, y)) for k, x, y in zip(kinds, xs, ys)], doreturn=False)
+        return len(visible)
+
+    def __len__(self):
+        return self.count
@@ -0,0 +1,239 @@
+import pygame
+
+from engine.collision import build_collision_index
+from engine.hud import HudText, TextCache
+from engine.pickups import PickupStore
+from engine.profiler import Profiler
+from engine.render import Camera, ChunkRenderer, DirtyRectRenderer
+from engine.timestep import FixedTimestep, lerp_rect
+
+# Jogo da pasta raiz (main.py) sobre um mapa já carregado
+# O main.py abre a janela, carrega o mapa e a spritesheet e chama run(); o
+# bench.py monta o mesmo Game sobre os mapas de teste e chama frame() com as
+# teclas de um roteiro. Os dois rodam o mesmo loop: jogador, itens, HUD,
+# renderização por retângulos sujos, perfil e passo fixo.
+
+
+# Classe do jogador
+class Player:
+    def __init__(self, x, y, tile_size, has_sprites=True):
+        self.x = x * tile_size
+        self.y = y * tile_size
+        self.width = tile_size
+        self.height = tile_size
+        self.speed = 3  # pixels por passo de simulação
+        self.rect = pygame.Rect(self.x, self.y, self.width, self.height)
+        self.prev_rect = self.rect.copy()  # posição no passo anterior
+        self.collected_items = 0
+        self.has_sprites = has_sprites
+
+        # Sprite do jogador
+        self.image = pygame.Surface((self.width, self.height))
+        if has_sprites:
+            self.image.fill((255, 0, 0))  # Vermelho
+        else:
+            self.image.fill((0, 0, 255))  # Azul como fallback
+
+    # keys: pygame.key.get_pressed() (ou qualquer objeto indexado pela tecla)
+    def update(self, walls, pickups, keys, profiler):
+        self.prev_rect = self.rect.copy()
+
+        dx, dy = 0, 0
+        if keys[pygame.K_LEFT]:
+            dx = -self.speed
+        if keys[pygame.K_RIGHT]:
+            dx = self.speed
+        if keys[pygame.K_UP]:
+            dy = -self.speed
+        if keys[pygame.K_DOWN]:
+            dy = self.speed
+
+        # Anda até encostar na primeira parede do caminho (sem deslizar);
+        # o contador de colisões soma os tiles consultados pela varredura
+        if dx or dy:
+            t, normal, tested = walls.sweep(self.rect, dx, dy)
+            profiler.count('colisões', tested)
+            if t > 0:
+                self.rect.x += round(dx * t)
+                self.rect.y += round(dy * t)
+                self.x = self.rect.x
+                self.y = self.rect.y
+
+        self.collected_items += len(pickups.collect(self.rect))
+
+    # Posição para desenhar, entre o passo anterior e o atual
+    def render_rect(self, alpha):
+        return lerp_rect(self.prev_rect, self.rect, alpha)
+
+    def draw(self, surface, camera, alpha=1.0):
+        rect = camera.apply(self.render_rect(alpha))
+        if self.has_sprites:
+            surface.blit(self.image, rect)
+        else:
+            pygame.draw.rect(surface, (0, 0, 255), rect)
+
+
+# Separa os itens coletáveis do mapa
+# As camadas ficam como grades compactas de ids; só os itens coletáveis viram
+# dicts, porque são poucos e saem do mapa quando coletados
+def process_map_data(tilemap):
+    pickups = PickupStore(tilemap.tile_size)
+
+    pickup_layer = tilemap.layer('Pickups')
+    if pickup_layer and not pickup_layer.collider:
+        tilemap.layers.remove(pickup_layer)
+        for tx, ty, tile_id in pickup_layer.tiles():
+            rect = tilemap.tile_rect(tx, ty)
+            pickups.add({
+                'id': tile_id,
+                'x': rect.x,
+                'y': rect.y,
+                'rect': rect,
+                'layer': 'Pickups'
+            })
+
+    return pickups
+
+
+class Game:
+    # tile_table: TileTable já montada (com as animações, se houver)
+    # baked: BakedChunks para ler/salvar os chunks desenhados, ou None
+    def __init__(self, screen, tilemap, tile_table, layer_order, animations=None,
+                 baked=None, spawn=(10, 10), render_mode='dirty', collision_backend='grid',
+                 simulation_rate=60, profiler=None):
+        self.screen = screen
+        self.tilemap = tilemap
+        self.tile_table = tile_table
+        self.animations = animations
+        self.render_mode = render_mode
+        self.profiler = profiler or Profiler()
+        self.timestep = FixedTimestep(simulation_rate)
+        size = tilemap.tile_size
+
+        self.pickups = process_map_data(tilemap)
+
+        # Filtra paredes para colisão (índice espacial por tile)
+        self.walls = build_collision_index(tilemap, collision_backend)
+
+        # Camadas estáticas desenhadas em chunks (cada chunk fica em cache)
+        self.renderer = ChunkRenderer(tilemap.width, tilemap.height, size, layer_order)
+        for layer in tilemap.layers:
+            self.renderer.set_grid_layer(layer, tile_table)
+        if animations is not None:
+            self.renderer.set_animations(animations)
+        if baked is not None:
+            self.renderer.use_baked(baked)
+
+        self.camera = Camera(screen.get_width(), screen.get_height(),
+                             tilemap.width * size, tilemap.height * size)
+
+        self.dirty = DirtyRectRenderer(screen, self.draw_world)
+        # Item coletado: só a área dele precisa ser redesenhada
+        self.pickups.on_collected(lambda pickup: self.invalidate(pickup['rect']))
+
+        self.player = Player(spawn[0], spawn[1], size, tile_table.spritesheet is not None)
+
+        # HUD: a fonte é carregada uma vez e o texto só é renderizado quando muda
+        self.text_cache = TextCache()
+        self.items_text = HudText(self.text_cache, 'Itens: {}', (255, 255, 255), (10, 10))
+
+    # Desenha o cenário: camadas estáticas e itens ainda não coletados
+    # (só a área de recorte da superfície, quando houver uma)
+    def draw_world(self, surface, camera):
+        profiler = self.profiler
+        surface.fill((0, 0, 0))
+        profiler.count('blits', self.renderer.draw(surface, camera))
+
+        with profiler.section('itens'):
+            area = surface.get_clip().move(camera.rect.topleft)
+            for pickup in self.pickups.in_rect(area):
+                # A imagem vem da tabela a cada desenho: um item animado mostra o quadro atual
+                image = self.tile_table.image(pickup['id'])
+                if image:
+                    surface.blit(image, camera.apply(pickup['rect']))
+                else:
+                    pygame.draw.rect(surface, (0, 255, 0), camera.apply(pickup['rect']))
+                profiler.count('blits')
+
+    # Marca uma área do mundo para redesenhar o fundo. Só no modo 'dirty': no
+    # 'flip' a tela toda é redesenhada a cada frame e nada esvaziaria a lista
+    def invalidate(self, rect):
+        if self.render_mode == 'dirty':
+            self.dirty.invalidate_world(rect)
+
+    # Trata um evento; devolve False quando o jogo deve fechar
+    def handle_event(self, event):
+        if event.type == pygame.QUIT:
+            return False
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_F3:
+                self.profiler.toggle()
+            elif event.key == pygame.K_F4:
+                self.profiler.dump('profile_trace.csv')
+        return True
+
+    # Um frame do jogo: dt é o tempo real do frame (ms), que vai para o
+    # acumulador do passo fixo, e keys as teclas pressionadas
+    def frame(self, dt, keys):
+        profiler = self.profiler
+        camera = self.camera
+        steps = self.timestep.advance(dt)
+
+        with profiler.section('update'):
+            for _ in range(steps):
+                self.player.update(self.walls, self.pickups, keys, profiler)
+            alpha = self.timestep.alpha
+            camera.follow(self.player.render_rect(alpha))
+
+            # Tiles animados: o quadro é calculado uma vez por id e só as células
+            # dos chunks visíveis (e os itens na tela) com quadro novo são redesenhadas
+            if self.animations is not None:
+                changed = self.animations.advance(dt)
+                for rect in self.renderer.update_animations(camera.rect):
+                    self.invalidate(rect)
+                if changed:
+                    for pickup in self.pickups.in_rect(camera.rect):
+                        if pickup['id'] in changed:
+                            self.invalidate(pickup['rect'])
+
+        # Desenha tudo na ordem correta
+        # 1. Cenário (camadas estáticas em chunks + itens coletáveis)
+        with profiler.section('tiles'):
+            if self.render_mode == 'dirty':
+                self.dirty.begin(camera)
+            else:
+                self.draw_world(self.screen, camera)
+
+        # 2. Desenha o jogador (por cima de tudo)
+        self.player.draw(self.screen, camera, alpha)
+
+        # Mostra contador de itens
+        self.items_text.set(self.player.collected_items)
+        self.items_text.draw(self.screen)
+
+        overlay = profiler.draw(self.screen, (max(self.screen.get_width() - 310, 0), 10))
+        with profiler.section('flip'):
+            if self.render_mode == 'dirty':
+                self.dirty.mark(camera.apply(self.player.render_rect(alpha)))
+                self.dirty.mark(self.items_text.rect)
+                if overlay:
+                    self.dirty.mark(overlay)
+                self.dirty.end()
+            else:
+                pygame.display.flip()
+        profiler.end_frame()
+
+    # Game loop; max_fps limita só o desenho (0 = sem limite)
+    def run(self, max_fps=0):
+        clock = pygame.time.Clock()
+        running = True
+        while running:
+            # Tempo real do frame vai para o acumulador do passo fixo
+            dt = clock.tick(max_fps)
+
+            with self.profiler.section('eventos'):
+                for event in pygame.event.get():
+                    if not self.handle_event(event):
+                        running = False
+
+            self.frame(dt, pygame.key.get_pressed())
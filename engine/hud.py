@@ -0,0 +1,77 @@
+from collections import OrderedDict
+from string import Formatter
+
+import pygame
+
+
+# Cache de textos renderizados
+# As fontes são carregadas uma única vez e cada texto renderizado fica guardado
+# por (texto, cor, fonte). Quando passa de max_entries, o texto usado há mais
+# tempo é descartado (LRU).
+class TextCache:
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.fonts = {}                  # (nome, tamanho) -> pygame.font.Font
+        self.surfaces = OrderedDict()    # (texto, cor, fonte) -> superfície
+        self.hits = 0
+        self.misses = 0
+
+    def font(self, font_key=(None, 24)):
+        font = self.fonts.get(font_key)
+        if font is None:
+            font = pygame.font.SysFont(*font_key)
+            self.fonts[font_key] = font
+        return font
+
+    def render(self, text, color, font_key=(None, 24)):
+        key = (text, tuple(color), font_key)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = self.font(font_key).render(text, True, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_entries:
+            self.surfaces.popitem(last=False)
+        return surface
+
+
+# Texto fixo do HUD com um valor (ex.: 'Itens: {}')
+# set() só renderiza de novo quando o texto final muda. Um texto com campos
+# fica em branco até o primeiro set(); um texto sem campos é desenhado direto.
+class HudText:
+    def __init__(self, cache, template, color, pos, font_key=(None, 24)):
+        self.cache = cache
+        self.template = template
+        self.color = color
+        self.pos = pos
+        self.font_key = font_key
+        self.text = None
+        self.surface = None
+        # True se o modelo tem algum campo ('{}') para preencher
+        self.has_fields = any(field is not None for _, field, _, _ in Formatter().parse(template))
+
+    # Devolve True se o texto mudou
+    def set(self, *values):
+        text = self.template.format(*values)
+        if text == self.text:
+            return False
+        self.text = text
+        self.surface = self.cache.render(text, self.color, self.font_key)
+        return True
+
+    @property
+    def rect(self):
+        if self.surface is None:
+            return pygame.Rect(self.pos, (0, 0))
+        return self.surface.get_rect(topleft=self.pos)
+
+    def draw(self, surface):
+        if self.surface is None:
+            if self.has_fields:
+                return
+            self.set()
+        surface.blit(self.surface, self.pos)
@@ -0,0 +1,292 @@
+import time
+
+from engine.animation import TileAnimations
+from engine.atlas import load_atlas
+from engine.cache import BakedChunks
+from engine.collision import build_collision_index
+from engine.loader import AssetLoader, run_loading_screen
+from engine.mapfile import load_map
+from engine.render import ChunkRenderer
+from engine.streaming import WorldStreamer, open_world
+from engine.tilemap import TileTable
+from engine.tileset import load_tileset
+
+
+# Descrição de uma fase: o mapa, a spritesheet com o mapeamento de tiles, a
+# ordem e as cores das camadas e onde o jogador começa (em tiles)
+# Sem mapping, as posições dos tiles saem da grade da spritesheet (e do
+# .tileset.json dela, se existir), só para os ids usados no mapa. Com
+# mapping, as posições precisam ser células da grade da folha: a imagem de
+# cada id vem do atlas compartilhado da folha.
+class Level:
+    def __init__(self, name, map_path, sheet_path, layer_order, layer_colors=None, mapping=None,
+                 spawn=(0, 0), default_color=(200, 200, 200), unmapped_color=None):
+        self.name = name
+        self.map_path = map_path
+        self.sheet_path = sheet_path
+        self.mapping = mapping
+        self.layer_order = list(layer_order)
+        self.layer_colors = layer_colors or {}
+        self.spawn = spawn
+        self.default_color = default_color
+        self.unmapped_color = unmapped_color
+
+    # Chaves dos recursos compartilháveis no AssetCache
+    # Com streaming o recurso é o resumo das regiões (WorldInfo), não o mapa
+    def map_key(self, streaming=False):
+        return ('regiões' if streaming else 'mapa', self.map_path)
+
+    # O atlas é o mesmo para todas as fases com a mesma folha e o mesmo
+    # tamanho de tile (só com as células que elas usam); o mapeamento de cada
+    # fase aponta para dentro dele
+    def atlas_key(self, tile_size):
+        return ('atlas', self.sheet_path, tile_size)
+
+
+# Cache de recursos com contagem de referências
+# Mapas e spritesheets (com os recortes que elas guardam) são carregados uma
+# vez e usados por todas as fases que apontam para os mesmos arquivos. Cada
+# fase carregada segura uma referência; collect() descarta o que ficou sem
+# nenhuma. Só é usado pela thread principal.
+class AssetCache:
+    def __init__(self):
+        self.entries = {}  # chave -> recurso
+        self.refs = {}     # chave -> número de fases usando
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    # Soma uma referência ao recurso; value é guardado se a chave ainda não
+    # estiver no cache (senão fica o que já estava lá)
+    def acquire(self, key, value=None):
+        if key not in self.entries:
+            self.entries[key] = value
+            self.refs[key] = 0
+        self.refs[key] += 1
+        return self.entries[key]
+
+    def release(self, key):
+        if self.refs.get(key, 0) > 0:
+            self.refs[key] -= 1
+
+    # Descarta os recursos sem nenhuma referência e devolve quantos foram
+    def collect(self):
+        unused = [key for key, refs in self.refs.items() if refs == 0]
+        for key in unused:
+            del self.entries[key]
+            del self.refs[key]
+        return len(unused)
+
+
+# Uma fase pronta para jogar: recursos compartilhados (mapa e spritesheet)
+# mais a colisão e o desenho, que são só dela. Com streaming, tilemap é o
+# WorldInfo das regiões (tamanho, ids e contagens, sem os tiles).
+class LoadedLevel:
+    def __init__(self, level, tilemap, spritesheet, atlas_mapping, tile_table, walls, renderer, animations=None):
+        self.level = level
+        self.tilemap = tilemap
+        self.spritesheet = spritesheet
+        self.atlas_mapping = atlas_mapping
+        self.tile_table = tile_table
+        self.walls = walls
+        self.renderer = renderer
+        self.animations = animations or TileAnimations()  # relógio dos tiles animados da fase
+
+    @property
+    def name(self):
+        return self.level.name
+
+    # Tiles das camadas desenhadas
+    @property
+    def tile_count(self):
+        return self.tilemap.tile_count(self.level.layer_order)
+
+
+# Recurso que já estava no cache (passa pelo loader como os outros)
+def _cached(value):
+    return value
+
+
+# A conversão para o formato da tela precisa ser feita na thread principal
+def _convert_atlas(result):
+    spritesheet, placement = result
+    return spritesheet.convert(), placement
+
+
+# Gerenciador de fases
+# Guarda várias fases e troca entre elas durante o jogo. preload() carrega
+# uma fase em segundo plano (um AssetLoader por fase) enquanto a atual
+# continua rodando; poll(), chamado a cada frame, termina na thread
+# principal o que precisa dela. Com a próxima fase já carregada, switch() só
+# troca as referências. A fase que sai libera seus recursos no AssetCache e
+# o que nenhuma outra fase usa é descartado.
+class LevelManager:
+    def __init__(self, levels, cache=None, collision_backend='grid', streaming=False):
+        self.levels = {level.name: level for level in levels}
+        self.order = [level.name for level in levels]
+        self.cache = cache or AssetCache()
+        self.collision_backend = collision_backend
+        self.streaming = streaming  # True: WorldStreamer no lugar da colisão e do renderizador
+        self.loaders = {}  # nome -> AssetLoader das fases carregando
+        self.loaded = {}   # nome -> LoadedLevel
+        self.current = None
+
+    # Fase depois da atual, ou depois de name (volta para a primeira no fim)
+    def next_name(self, name=None):
+        if name is None:
+            if self.current is None:
+                return self.order[0]
+            name = self.current.name
+        return self.order[(self.order.index(name) + 1) % len(self.order)]
+
+    # Recurso compartilhado: já no cache ou carregado numa thread
+    def _add_shared(self, loader, name, key, load, *args, after=(), finish=None):
+        cached = self.cache.get(key)
+        if cached is not None:
+            loader.add(name, _cached, cached)
+        else:
+            loader.add(name, load, *args, after=after, finish=finish)
+
+    # Começa a carregar uma fase em segundo plano (se ainda não foi)
+    # O atlas da folha só entra depois dos tiles, quando o tamanho do tile
+    # (parte da chave no cache) já é conhecido.
+    def preload(self, name):
+        if name in self.loaded or name in self.loaders:
+            return
+        level = self.levels[name]
+        loader = AssetLoader()
+        if self.streaming:
+            # Só o meta das regiões: o mapa inteiro não é lido (a não ser na
+            # primeira vez, para gravar as regiões)
+            self._add_shared(loader, 'mapa', level.map_key(True), open_world, level.map_path)
+        else:
+            self._add_shared(loader, 'mapa', level.map_key(), load_map, level.map_path)
+        loader.add('tiles', self._read_mapping, level, after=['mapa'],
+                   finish=lambda tiles: self._add_atlas(loader, level, tiles))
+        loader.add('mundo', self._build_world, level, after=['mapa', 'tiles', 'spritesheet'])
+        self.loaders[name] = loader
+
+    # Mapeamento {id: (x, y)} na folha, animações e tamanho do tile da fase
+    # (com mapping fixo, a fase não tem tiles animados)
+    def _read_mapping(self, level, tilemap):
+        if level.mapping is not None:
+            return level.mapping, {}, tilemap.tile_size
+        tileset = load_tileset(level.sheet_path, tilemap.tile_size)
+        return tileset.mapping(tilemap.used_ids()), tileset.animations, tilemap.tile_size
+
+    # Roda na thread principal (finish dos tiles), onde o cache pode ser lido
+    def _add_atlas(self, loader, level, tiles):
+        mapping, _, tile_size = tiles
+        self._add_shared(loader, 'spritesheet', level.atlas_key(tile_size), self._read_sheet_atlas,
+                         level, mapping, tile_size, finish=_convert_atlas)
+        return tiles
+
+    # Atlas com as células da folha usadas pela fase e pelas outras fases da
+    # mesma folha (com o mesmo tamanho de tile), e a posição de cada uma no
+    # atlas: {(x, y) na folha: (x, y) no atlas}. É o recurso compartilhado
+    # entre essas fases; uma folha usada por uma fase só fica com um atlas
+    # só dela, com as células do mapa.
+    def _read_sheet_atlas(self, level, mapping, tile_size):
+        cells = {tuple(pos) for pos in mapping.values()}
+        for other in self.levels.values():
+            if other is level or other.sheet_path != level.sheet_path:
+                continue
+            tilemap = open_world(other.map_path) if self.streaming else load_map(other.map_path)
+            if tilemap.tile_size == tile_size:
+                cells.update(tuple(pos) for pos in self._read_mapping(other, tilemap)[0].values())
+        cells = sorted(cells)
+        spritesheet, atlas_mapping = load_atlas(level.sheet_path, dict(enumerate(cells)), tile_size,
+                                                convert=False)
+        placement = {cell: atlas_mapping[i] for i, cell in enumerate(cells)}
+        return spritesheet, placement
+
+    # Colisão e desenho da fase (roda numa thread; nada aqui precisa da janela)
+    def _build_world(self, level, tilemap, tiles, atlas):
+        mapping, animations, tile_size = tiles
+        spritesheet, placement = atlas
+        # Posições dos ids da fase dentro do atlas compartilhado
+        atlas_mapping = {tile_id: placement[tuple(pos)] for tile_id, pos in mapping.items()
+                         if tuple(pos) in placement}
+        # Cada fase tem o próprio relógio, que começa do zero quando ela entra
+        animations = TileAnimations(animations)
+        tile_table = TileTable(spritesheet, atlas_mapping, tilemap.tile_size, level.layer_colors,
+                               level.default_color, level.unmapped_color, animations=animations)
+        if self.streaming:
+            world = WorldStreamer(tilemap.directory, tile_table, level.layer_order)
+            world.set_animations(animations)
+            return atlas_mapping, tile_table, world, world, animations
+
+        walls = build_collision_index(tilemap, self.collision_backend)
+        renderer = ChunkRenderer(tilemap.width, tilemap.height, tilemap.tile_size, level.layer_order)
+        for layer in tilemap.layers:
+            if layer.name in level.layer_order:
+                renderer.set_grid_layer(layer, tile_table)
+        renderer.set_animations(animations)
+        # Chunks já desenhados em execuções anteriores são lidos de .cache/
+        renderer.use_baked(BakedChunks.for_world(level.map_path, level.sheet_path, mapping,
+                                                 level.layer_order, level.layer_colors))
+        return atlas_mapping, tile_table, walls, renderer, animations
+
+    # Junta os resultados de uma fase que terminou de carregar
+    def _install(self, name, results):
+        level = self.levels[name]
+        tilemap = self.cache.acquire(level.map_key(self.streaming), results['mapa'])
+        spritesheet, placement = self.cache.acquire(level.atlas_key(results['tiles'][2]), results['spritesheet'])
+        atlas_mapping, tile_table, walls, renderer, animations = results['mundo']
+        self.loaded[name] = LoadedLevel(level, tilemap, spritesheet, atlas_mapping, tile_table, walls, renderer,
+                                        animations)
+        return self.loaded[name]
+
+    # Avança as fases carregando em segundo plano; devolve as que ficaram prontas
+    def poll(self):
+        ready = []
+        for name, loader in list(self.loaders.items()):
+            if loader.poll():
+                loader.shutdown()
+                del self.loaders[name]
+                ready.append(self._install(name, loader.results))
+        return ready
+
+    def is_ready(self, name):
+        return name in self.loaded
+
+    # Fase carregada, esperando o carregamento se preciso. Com screen, a
+    # espera mostra a tela de carregamento.
+    def load(self, name, screen=None):
+        if name not in self.loaded:
+            self.preload(name)
+            loader = self.loaders.pop(name)
+            if screen is not None:
+                results = run_loading_screen(screen, loader)
+            else:
+                while not loader.poll():
+                    time.sleep(0.001)
+                loader.shutdown()
+                results = loader.results
+            self._install(name, results)
+        return self.loaded[name]
+
+    # Troca a fase atual e libera a anterior, a não ser que ela esteja em
+    # keep (ex.: a anterior também é a próxima, com só duas fases)
+    def switch(self, name, screen=None, keep=()):
+        level = self.load(name, screen)
+        previous = self.current
+        self.current = level
+        if previous is not None and previous is not level and previous.name not in keep:
+            self.unload(previous.name)
+        return level
+
+    # Libera uma fase carregada e descarta os recursos que ficaram sem uso
+    def unload(self, name):
+        level = self.loaded.pop(name, None)
+        if level is None:
+            return
+        self.cache.release(level.level.map_key(self.streaming))
+        self.cache.release(level.level.atlas_key(level.tile_table.tile_size))
+        if self.streaming:
+            level.renderer.close()
+        self.cache.collect()
+
@@ -0,0 +1,98 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pygame
+
+from engine.hud import TextCache
+
+
+# Carregamento de recursos em segundo plano
+# Cada recurso é uma função (ler o mapa, decodificar a spritesheet...) que
+# roda numa thread do pool. Um recurso pode depender de outros (after): ele
+# só começa quando eles terminam e recebe os resultados deles depois dos
+# próprios argumentos. O passo final de cada um (finish), como o
+# convert_alpha(), que precisa da janela, roda na thread principal dentro de
+# poll(). Assim o loop de eventos continua rodando enquanto tudo carrega.
+class AssetLoader:
+    def __init__(self, workers=2):
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.jobs = {}      # nome -> (load, args, after, finish)
+        self.futures = {}   # nome -> Future dos recursos já enviados ao pool
+        self.results = {}   # nome -> resultado final (depois do finish)
+
+    def add(self, name, load, *args, after=(), finish=None):
+        self.jobs[name] = (load, args, tuple(after), finish)
+        self._submit_ready()
+
+    def _submit_ready(self):
+        for name, (load, args, after, _) in self.jobs.items():
+            if name in self.futures or any(dep not in self.results for dep in after):
+                continue
+            deps = [self.results[dep] for dep in after]
+            self.futures[name] = self.pool.submit(load, *args, *deps)
+
+    # Recolhe o que terminou e envia o que ficou pronto para começar.
+    # Um erro numa thread é relançado aqui, como se o carregamento fosse
+    # direto. Devolve True quando tudo terminou.
+    def poll(self):
+        for name, future in list(self.futures.items()):
+            if name in self.results or not future.done():
+                continue
+            result = future.result()
+            finish = self.jobs[name][3]
+            self.results[name] = finish(result) if finish else result
+        self._submit_ready()
+        return self.done
+
+    @property
+    def done(self):
+        return len(self.results) == len(self.jobs)
+
+    # Fração dos recursos já carregados (0..1)
+    @property
+    def progress(self):
+        if not self.jobs:
+            return 1.0
+        return len(self.results) / len(self.jobs)
+
+    # Nomes dos recursos ainda carregando
+    @property
+    def pending(self):
+        return [name for name in self.jobs if name not in self.results]
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False)
+
+
+# Tela de carregamento
+# Mostra uma barra de progresso e os recursos que faltam, mantendo a janela
+# respondendo (dá para fechar) enquanto o AssetLoader trabalha. Devolve os
+# resultados quando tudo termina.
+def run_loading_screen(screen, loader, title="Carregando..."):
+    clock = pygame.time.Clock()
+    text_cache = TextCache()
+    width, height = screen.get_size()
+    bar = pygame.Rect(0, 0, min(400, width - 40), 24)
+    bar.center = (width // 2, height // 2)
+
+    while not loader.poll():
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                loader.shutdown()
+                pygame.quit()
+                sys.exit()
+
+        screen.fill((20, 20, 30))
+        title_surface = text_cache.render(title, (255, 255, 255), (None, 36))
+        screen.blit(title_surface, title_surface.get_rect(midbottom=(width // 2, bar.top - 12)))
+        pygame.draw.rect(screen, (80, 80, 90), bar, 2)
+        filled = bar.inflate(-6, -6)
+        filled.width = round(filled.width * loader.progress)
+        pygame.draw.rect(screen, (100, 180, 100), filled)
+        pending = text_cache.render(', '.join(loader.pending), (180, 180, 180))
+        screen.blit(pending, pending.get_rect(midtop=(width // 2, bar.bottom + 12)))
+        pygame.display.flip()
+        clock.tick(60)
+
+    loader.shutdown()
+    return loader.results
@@ -0,0 +1,172 @@
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+
+from engine.cache import cache_dir_for, file_digest, remove_stale
+from engine.mapparallel import read_map_json
+from engine.tilemap import EMPTY, TileMap
+
+# Formato binário compilado do map.json (.tmap)
+#
+#   cabeçalho:  magic 'TMAP', versão, flags, tileSize, mapWidth, mapHeight e
+#               número de camadas
+#   camadas:    para cada uma, nome, collider, quantidade de tiles e o
+#               deslocamento dos dados no arquivo
+#   dados:      uma grade int32 little-endian (mapWidth x mapHeight) por
+#               camada, com -1 nas células vazias
+#   máscara:    (flag HAS_MASK) 1 byte por célula, 1 onde alguma camada
+#               colisora tem tile
+#
+# O carregamento mapeia o arquivo na memória e as camadas usam as grades
+# direto do mapa, sem copiar nem converter tile por tile.
+# O arquivo fica em .cache/ com o hash do conteúdo do JSON no nome, então
+# qualquer mudança no map.json gera um compilado novo (e tocar no arquivo
+# sem mudar o conteúdo, como num checkout, não).
+MAGIC = b'TMAP'
+VERSION = 3
+HAS_MASK = 1
+HEADER = struct.Struct('<4sHHIIII')
+LAYER_HEADER = struct.Struct('<HBxIQ')
+
+
+def map_key(json_path):
+    return file_digest(json_path)[:16]
+
+
+def compiled_path(json_path, key=None):
+    name = os.path.splitext(os.path.basename(json_path))[0]
+    return os.path.join(cache_dir_for(json_path), f'{name}.{key or map_key(json_path)}.tmap')
+
+
+# Máscara de colisão (1 byte por célula) a partir das camadas colisoras
+def collider_mask(tilemap):
+    mask = bytearray(tilemap.width * tilemap.height)
+    for layer in tilemap.layers:
+        if layer.collider:
+            for i, tile_id in enumerate(layer.ids):
+                if tile_id != EMPTY:
+                    mask[i] = 1
+    return mask
+
+
+# Escreve um TileMap no formato compilado
+def write_compiled(tilemap, path):
+    size = tilemap.width * tilemap.height
+    names = [layer.name.encode('utf-8') for layer in tilemap.layers]
+    offset = HEADER.size + sum(LAYER_HEADER.size + len(name) for name in names)
+    offset = (offset + 3) & ~3
+    mask = tilemap.collider_mask
+    if mask is None:
+        mask = collider_mask(tilemap)
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, HAS_MASK, tilemap.tile_size, tilemap.width, tilemap.height,
+                            len(tilemap.layers)))
+        for layer, name in zip(tilemap.layers, names):
+            f.write(LAYER_HEADER.pack(len(name), 1 if layer.collider else 0, layer.count, offset))
+            f.write(name)
+            offset += size * 4
+        f.write(b'\0' * (-f.tell() % 4))
+        for layer in tilemap.layers:
+            ids = array('i', layer.ids)
+            if sys.byteorder != 'little':
+                ids.byteswap()
+            f.write(ids.tobytes())
+        f.write(bytes(mask))
+    os.replace(tmp_path, path)
+
+
+# Lê o arquivo compilado; devolve None se ele for de outra versão do formato
+# (o conteúdo do JSON já é conferido pela chave no nome do arquivo)
+def read_compiled(path):
+    with open(path, 'rb') as f:
+        # ACCESS_COPY: as páginas são compartilhadas até alguém alterar um
+        # tile (ex.: porta aberta), e a alteração nunca volta para o arquivo
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    magic, version, flags, tile_size, width, height, layer_count = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        return None
+
+    tilemap = TileMap(tile_size, width, height)
+    view = memoryview(data)
+    pos = HEADER.size
+    end = 0
+    for _ in range(layer_count):
+        name_len, collider, count, offset = LAYER_HEADER.unpack_from(data, pos)
+        pos += LAYER_HEADER.size
+        name = bytes(data[pos:pos + name_len]).decode('utf-8')
+        pos += name_len
+        ids = view[offset:offset + width * height * 4].cast('i')
+        if sys.byteorder != 'little':
+            ids = array('i', ids)
+            ids.byteswap()
+        tilemap.add_layer(name, bool(collider), ids, count)
+        end = max(end, offset + width * height * 4)
+    if flags & HAS_MASK:
+        end = end or (HEADER.size + 3) & ~3
+        tilemap.collider_mask = view[end:end + width * height]
+    return tilemap
+
+
+# Compila o map.json para o formato binário (sem out_path, no .cache/ ao
+# lado dele, apagando os compilados de versões antigas do mapa)
+def compile_map(json_path, out_path=None, workers=None):
+    tilemap = read_map_json(json_path, workers)
+    if out_path:
+        write_compiled(tilemap, out_path)
+        return tilemap
+    key = map_key(json_path)
+    write_compiled(tilemap, compiled_path(json_path, key))
+    name = os.path.splitext(os.path.basename(json_path))[0]
+    remove_stale(cache_dir_for(json_path), name, 'tmap', key)
+    return tilemap
+
+
+# Carrega o mapa pelo arquivo compilado quando existe um para este conteúdo
+# do JSON; senão lê o JSON (em fluxo, ou em paralelo se for grande) e gera o
+# compilado para a próxima vez, apagando os de versões antigas do mapa
+def load_map(json_path, workers=None):
+    key = map_key(json_path)
+    path = compiled_path(json_path, key)
+    if os.path.exists(path):
+        try:
+            tilemap = read_compiled(path)
+        except (OSError, ValueError, struct.error):
+            tilemap = None
+        if tilemap is not None:
+            return tilemap
+
+    tilemap = read_map_json(json_path, workers)
+    try:
+        write_compiled(tilemap, path)
+        name = os.path.splitext(os.path.basename(json_path))[0]
+        remove_stale(cache_dir_for(json_path), name, 'tmap', key)
+    except OSError as e:
+        print(f"Não foi possível salvar o mapa compilado: {e}")
+    return tilemap
+
+
+# Pré-compila mapas pela linha de comando, na thread principal: é onde o
+# pool de processos pode fazer o fork, então um mapa grande é decodificado
+# em todos os núcleos. Os jogos carregam o mapa numa thread do AssetLoader
+# e, com o compilado já no .cache/, só mapeiam o arquivo.
+#
+#   python -m engine.mapfile map.json Tiny_Swords-ok/map.json
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Uso: python -m engine.mapfile <map.json> [<map.json> ...]")
+        sys.exit(1)
+    for json_path in sys.argv[1:]:
+        path = compiled_path(json_path)
+        if os.path.exists(path):
+            print(f"{json_path}: já compilado em {path}")
+            continue
+        start = time.perf_counter()
+        compile_map(json_path)
+        print(f"{json_path}: compilado em {path} ({(time.perf_counter() - start) * 1000:.0f} ms)")
@@ -0,0 +1,174 @@
+import json
+import multiprocessing
+import os
+import re
+import threading
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from engine.mapstream import stream_map
+from engine.tilemap import EMPTY, TileMap
+
+# Abaixo deste tamanho o map.json é lido em fluxo (stream_map): criar o pool
+# custa mais do que decodificar o mapa inteiro
+PARALLEL_MIN_BYTES = 8 << 20
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = re.compile(r'[ \t\r\n]*')
+
+
+def _skip_ws(text, pos):
+    return _WHITESPACE.match(text, pos).end()
+
+
+def _expect(text, pos, char):
+    pos = _skip_ws(text, pos)
+    if text[pos:pos + 1] != char:
+        raise ValueError(f"JSON inválido: esperado {char!r} na posição {pos}")
+    return pos + 1
+
+
+# Fim de uma lista de tiles sem decodificá-la: como cada tile é um objeto
+# simples (sem listas dentro), a lista termina no primeiro ']' fora de
+# string. Se aparecer uma lista aninhada, decodifica do jeito normal.
+def _skip_tiles(text, pos):
+    end = pos
+    while True:
+        end = text.find(']', end + 1)
+        if end < 0:
+            raise ValueError("JSON inválido: lista de tiles sem fim")
+        # Com um número ímpar de aspas antes dele, o ']' está dentro de uma string
+        if text.count('"', pos, end) % 2 == 0:
+            break
+    if text.find('[', pos + 1, end) != -1:
+        return _decoder.raw_decode(text, pos)[1]
+    return end + 1
+
+
+# Fim do objeto de uma camada, pulando a lista de tiles
+def _skip_layer(text, pos):
+    pos = _expect(text, pos, '{')
+    pos = _skip_ws(text, pos)
+    if text[pos] == '}':
+        return pos + 1
+    while True:
+        key, pos = _decoder.raw_decode(text, _skip_ws(text, pos))
+        pos = _skip_ws(text, _expect(text, pos, ':'))
+        if key == 'tiles' and text[pos] == '[':
+            pos = _skip_tiles(text, pos)
+        else:
+            pos = _decoder.raw_decode(text, pos)[1]
+        pos = _skip_ws(text, pos)
+        if text[pos] == '}':
+            return pos + 1
+        pos = _expect(text, pos, ',')
+
+
+# Uma passada pelo texto do map.json: lê o cabeçalho (tileSize, mapWidth,
+# mapHeight) e devolve o trecho de texto de cada camada, sem decodificar os
+# tiles, para que as camadas sejam decodificadas em paralelo
+def split_layers(text):
+    header = {}
+    layers = []
+    pos = _expect(text, 0, '{')
+    while True:
+        pos = _skip_ws(text, pos)
+        if text[pos] == '}':
+            break
+        key, pos = _decoder.raw_decode(text, pos)
+        pos = _skip_ws(text, _expect(text, pos, ':'))
+        if key == 'layers':
+            pos = _skip_ws(text, _expect(text, pos, '['))
+            while text[pos] != ']':
+                end = _skip_layer(text, pos)
+                layers.append(text[pos:end])
+                pos = _skip_ws(text, end)
+                if text[pos] == ',':
+                    pos = _skip_ws(text, pos + 1)
+            pos += 1
+        else:
+            header[key], pos = _decoder.raw_decode(text, pos)
+        pos = _skip_ws(text, pos)
+        if text[pos] == ',':
+            pos += 1
+    return header, layers
+
+
+# Trabalho de cada processo: decodifica o texto de uma camada numa grade
+# compacta e, se ela for colisora, na máscara de colisão (1 byte por célula).
+# Devolve bytes para a volta ao processo principal ser uma cópia só.
+def decode_layer(layer_text, width, height):
+    data = json.loads(layer_text)
+    collider = bool(data.get('collider', False))
+    ids = array('i', [EMPTY]) * (width * height)
+    mask = bytearray(width * height) if collider else None
+    for tile in data.get('tiles', ()):
+        i = int(tile['y']) * width + int(tile['x'])
+        ids[i] = int(tile['id'])
+        if collider:
+            mask[i] = 1
+    count = len(ids) - ids.count(EMPTY)
+    return data.get('name'), collider, ids.tobytes(), count, mask
+
+
+# Um fork só é seguro sem outras threads vivas: uma delas pode estar
+# segurando um lock que o processo filho herda travado. Então o pool só é
+# criado na thread principal e sem outras threads do Python (antes do
+# AssetLoader começar, por exemplo).
+def can_fork():
+    return ('fork' in multiprocessing.get_all_start_methods()
+            and threading.current_thread() is threading.main_thread()
+            and threading.active_count() == 1)
+
+
+# Carrega um map.json decodificando as camadas em paralelo num pool de
+# processos. O texto é lido uma vez, dividido por camada numa passada só, e
+# as grades e máscaras de colisão de cada camada voltam prontas para serem
+# juntadas; a máscara final (OU de todas as camadas colisoras) fica em
+# tilemap.collider_mask.
+# O pool usa 'fork' porque os scripts do jogo não têm um bloco
+# if __name__ == '__main__' (com 'spawn' cada processo rodaria o jogo de
+# novo). Quando não dá para fazer o fork (mapa lido por uma thread do
+# AssetLoader, Windows ou um núcleo só), as camadas são decodificadas aqui
+# mesmo, uma por vez; como o mapa compilado fica em .cache/, isso só pesa
+# na primeira vez que o mapa é lido. Para usar todos os núcleos num mapa
+# grande, compile antes pela linha de comando (python -m engine.mapfile).
+def parallel_load_map(json_path, workers=None):
+    with open(json_path, encoding='utf-8') as f:
+        text = f.read()
+    header, layer_texts = split_layers(text)
+    del text
+    width, height = header['mapWidth'], header['mapHeight']
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(layer_texts))
+    if workers > 1 and can_fork():
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            results = list(pool.map(decode_layer, layer_texts, repeat(width), repeat(height)))
+    else:
+        results = [decode_layer(layer_text, width, height) for layer_text in layer_texts]
+
+    tilemap = TileMap(header['tileSize'], width, height)
+    merged = 0
+    for name, collider, data, count, mask in results:
+        ids = array('i')
+        ids.frombytes(data)
+        tilemap.add_layer(name, collider, ids, count)
+        if mask is not None:
+            merged |= int.from_bytes(mask, 'little')
+    tilemap.collider_mask = bytearray(merged.to_bytes(width * height, 'little'))
+    return tilemap
+
+
+# Lê um map.json do jeito mais rápido para o tamanho dele: em fluxo quando é
+# pequeno (memória mínima) ou em paralelo quando é grande. Sem poder fazer o
+# fork (ex.: numa thread do AssetLoader), o mapa grande ainda é dividido por
+# camada e decodificado aqui mesmo, uma por vez: cerca de 2x mais rápido que
+# o stream_map.
+def read_map_json(json_path, workers=None):
+    if os.path.getsize(json_path) < PARALLEL_MIN_BYTES:
+        return stream_map(json_path)
+    return parallel_load_map(json_path, workers if can_fork() else 1)
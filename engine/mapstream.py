@@ -0,0 +1,141 @@
+import json
+from array import array
+
+from engine.tilemap import EMPTY, TileMap
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\r\n'
+
+
+# Leitor incremental de JSON
+# Lê o arquivo em blocos e deixa o chamador percorrer objetos e listas um
+# item por vez; só valores pequenos (um tile, um nome, um número) são
+# decodificados de uma vez, então a árvore do documento nunca fica inteira
+# na memória.
+class _JsonReader:
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        data = self.f.read(self.chunk_size)
+        if not data:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                raise ValueError("Fim inesperado do JSON")
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"JSON inválido: esperado {char!r}, encontrado {found!r}")
+        self.pos += 1
+
+    def read_value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # Um número no fim do buffer pode continuar no próximo bloco
+            if end == len(self.buf) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    # Percorre as chaves de um objeto; o chamador deve ler o valor de cada uma
+    def iter_object(self):
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.read_value()
+            self.expect(':')
+            yield key
+            if self.peek() == '}':
+                self.pos += 1
+                return
+            self.expect(',')
+
+    # Percorre os itens de uma lista; o chamador deve ler cada item
+    def iter_array(self):
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield
+            if self.peek() == ']':
+                self.pos += 1
+                return
+            self.expect(',')
+
+
+# Carrega um map.json em fluxo, montando direto as grades do TileMap
+# Cada tile é decodificado, gravado na grade da camada e descartado. Se as
+# dimensões do mapa aparecerem depois das camadas no arquivo, os tiles ficam
+# guardados como trincas (x, y, id) num array até elas serem conhecidas.
+def stream_map(path, chunk_size=1 << 16):
+    header = {}
+    layers = []  # (nome, collider, grade ou trincas, quantidade)
+
+    with open(path, encoding='utf-8') as f:
+        reader = _JsonReader(f, chunk_size)
+        for key in reader.iter_object():
+            if key != 'layers':
+                header[key] = reader.read_value()
+                continue
+
+            for _ in reader.iter_array():
+                name, collider = None, False
+                width = header.get('mapWidth')
+                if width is not None and 'mapHeight' in header:
+                    cells = array('i', [EMPTY]) * (width * header['mapHeight'])
+                    dense = True
+                else:
+                    cells = array('i')
+                    dense = False
+
+                for layer_key in reader.iter_object():
+                    if layer_key == 'name':
+                        name = reader.read_value()
+                    elif layer_key == 'collider':
+                        collider = bool(reader.read_value())
+                    elif layer_key == 'tiles':
+                        for _ in reader.iter_array():
+                            tile = reader.read_value()
+                            x, y, tile_id = int(tile['x']), int(tile['y']), int(tile['id'])
+                            if dense:
+                                cells[y * width + x] = tile_id
+                            else:
+                                cells.extend((x, y, tile_id))
+                    else:
+                        reader.read_value()
+                layers.append((name, collider, cells, dense))
+
+    tilemap = TileMap(header['tileSize'], header['mapWidth'], header['mapHeight'])
+    for name, collider, cells, dense in layers:
+        if dense:
+            tilemap.add_layer(name, collider, cells)
+            continue
+        layer = tilemap.add_layer(name, collider)
+        for i in range(0, len(cells), 3):
+            layer.set(cells[i], cells[i + 1], cells[i + 2])
+    return tilemap
@@ -0,0 +1,66 @@
+# Itens coletáveis indexados pela célula do tile
+# Procurar, coletar e remover um item é O(1): só as células cobertas pelo
+# retângulo do jogador são olhadas. Quem precisar saber da coleta (ex.: o
+# renderizador, para redesenhar só a área do item) se registra com
+# on_collected.
+class PickupStore:
+    def __init__(self, tile_size, pickups=()):
+        self.tile_size = tile_size
+        self.cells = {}      # (tx, ty) -> lista de itens naquela célula
+        self.count = 0
+        self.listeners = []  # funções chamadas com cada item coletado
+        for pickup in pickups:
+            self.add(pickup)
+
+    def cell_of(self, pickup):
+        return (pickup['rect'].x // self.tile_size, pickup['rect'].y // self.tile_size)
+
+    def add(self, pickup):
+        self.cells.setdefault(self.cell_of(pickup), []).append(pickup)
+        self.count += 1
+
+    def remove(self, pickup):
+        key = self.cell_of(pickup)
+        cell = self.cells.get(key)
+        if not cell:
+            return False
+        for i, other in enumerate(cell):
+            if other is pickup:
+                del cell[i]
+                if not cell:
+                    del self.cells[key]
+                self.count -= 1
+                return True
+        return False
+
+    def at(self, tx, ty):
+        return self.cells.get((tx, ty), [])
+
+    # Itens das células cobertas por um retângulo em pixels
+    def in_rect(self, rect):
+        size = self.tile_size
+        found = []
+        for ty in range(rect.top // size, (rect.bottom - 1) // size + 1):
+            for tx in range(rect.left // size, (rect.right - 1) // size + 1):
+                found.extend(self.cells.get((tx, ty), ()))
+        return found
+
+    # Coleta os itens que tocam o retângulo e avisa os interessados
+    def collect(self, rect):
+        collected = []
+        for pickup in self.in_rect(rect):
+            if rect.colliderect(pickup['rect']) and self.remove(pickup):
+                collected.append(pickup)
+                for callback in self.listeners:
+                    callback(pickup)
+        return collected
+
+    def on_collected(self, callback):
+        self.listeners.append(callback)
+
+    def __iter__(self):
+        for cell in list(self.cells.values()):
+            yield from cell
+
+    def __len__(self):
+        return self.count
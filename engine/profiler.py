@@ -0,0 +1,132 @@
+import csv
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pygame
+
+
+# Instrumentação por frame
+# section() mede o tempo de um trecho do loop e count() soma contadores
+# (blits, testes de colisão...). end_frame() fecha o frame: guarda os valores
+# num histórico circular (para o overlay) e numa trilha que pode ser salva
+# em CSV ou JSON com dump().
+class Profiler:
+    def __init__(self, history=240, trace_limit=36000):
+        self.enabled = True
+        self.visible = False
+        self.history = history
+        self.timings = {}   # seção -> deque com os tempos dos últimos frames (s)
+        self.counters = {}  # contador -> deque com os valores dos últimos frames
+        self.frame_times = deque(maxlen=history)
+        self.trace = deque(maxlen=trace_limit)
+        self._current = {}
+        self._counts = {}
+        self._frame_start = time.perf_counter()
+        self._font = None
+
+    @contextmanager
+    def section(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._current[name] = self._current.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            self._counts[name] = self._counts.get(name, 0) + amount
+
+    def end_frame(self):
+        now = time.perf_counter()
+        frame_time = now - self._frame_start
+        self._frame_start = now
+        if not self.enabled:
+            return
+
+        self.frame_times.append(frame_time)
+        # Seções e contadores novos entram no fim, na ordem em que apareceram
+        for name in self._current:
+            self.timings.setdefault(name, deque(maxlen=self.history))
+        for name in self._counts:
+            self.counters.setdefault(name, deque(maxlen=self.history))
+        for name, values in self.timings.items():
+            values.append(self._current.get(name, 0.0))
+        for name, values in self.counters.items():
+            values.append(self._counts.get(name, 0))
+
+        row = {'frame_ms': frame_time * 1000}
+        for name, value in self._current.items():
+            row[name + '_ms'] = value * 1000
+        row.update(self._counts)
+        self.trace.append(row)
+        self._current = {}
+        self._counts = {}
+
+    def toggle(self):
+        self.visible = not self.visible
+
+    # Média, p95 e máximo (em ms) de uma seção no histórico
+    def stats(self, name):
+        values = sorted(self.frame_times if name == 'frame' else self.timings.get(name, ()))
+        if not values:
+            return 0.0, 0.0, 0.0
+        p95 = values[min(int(len(values) * 0.95), len(values) - 1)]
+        return sum(values) / len(values) * 1000, p95 * 1000, values[-1] * 1000
+
+    # Salva a trilha de frames em CSV ou JSON (pela extensão do arquivo)
+    def dump(self, path):
+        rows = list(self.trace)
+        if path.endswith('.json'):
+            with open(path, 'w') as f:
+                json.dump(rows, f, indent=1)
+        else:
+            columns = []
+            for row in rows:
+                for key in row:
+                    if key not in columns:
+                        columns.append(key)
+            with open(path, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=columns, restval=0)
+                writer.writeheader()
+                writer.writerows(rows)
+        print(f"Perfil salvo em {path} ({len(rows)} frames)")
+
+    # Desenha o overlay e devolve a área ocupada (ou None se estiver oculto)
+    def draw(self, surface, pos=(10, 10)):
+        if not self.visible:
+            return None
+        if self._font is None:
+            self._font = pygame.font.Font(None, 18)
+
+        lines = []
+        for name in ['frame'] + list(self.timings):
+            mean, p95, worst = self.stats(name)
+            lines.append(f"{name:<10} {mean:6.2f} ms  p95 {p95:6.2f}  máx {worst:6.2f}")
+        for name in self.counters:
+            values = self.counters[name]
+            lines.append(f"{name:<10} {values[-1] if values else 0}")
+
+        graph_height = 50
+        width = 300
+        height = len(lines) * 16 + graph_height + 14
+        panel = pygame.Surface((width, height), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 170))
+        for i, line in enumerate(lines):
+            panel.blit(self._font.render(line, True, (255, 255, 255)), (6, 4 + i * 16))
+
+        # Gráfico do tempo de frame; a linha amarela marca 16,7 ms (60 fps)
+        top = len(lines) * 16 + 8
+        scale = graph_height / 33.3
+        budget_y = top + graph_height - int(16.7 * scale)
+        pygame.draw.line(panel, (255, 220, 0), (6, budget_y), (width - 6, budget_y), 1)
+        times = list(self.frame_times)[-(width - 12):]
+        if len(times) > 1:
+            points = [(6 + i, top + graph_height - min(int(t * 1000 * scale), graph_height))
+                      for i, t in enumerate(times)]
+            pygame.draw.lines(panel, (0, 255, 120), False, points, 1)
+        return surface.blit(panel, pos)
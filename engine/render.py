@@ -0,0 +1,397 @@
+import pygame
+
+from engine.animation import AnimatedCells, find_tiles
+from engine.tilemap import EMPTY
+
+
+# Desenha um tile (imagem ou cor sólida) deslocado pela origem da superfície
+def draw_tile(surface, tile, origin=(0, 0)):
+    x = tile['rect'].x - origin[0]
+    y = tile['rect'].y - origin[1]
+    if tile['image']:
+        surface.blit(tile['image'], (x, y))
+    elif tile['color']:
+        pygame.draw.rect(surface, tile['color'], (x, y, tile['rect'].width, tile['rect'].height))
+
+
+# Desenha a parte de uma camada compacta (TileLayer) que cai dentro de area
+def draw_grid_layer(surface, layer, table, area, origin=(0, 0)):
+    size = layer.tile_size
+    x0 = max(area.left // size, 0)
+    y0 = max(area.top // size, 0)
+    x1 = min((area.right - 1) // size, layer.width - 1)
+    y1 = min((area.bottom - 1) // size, layer.height - 1)
+    ids = layer.ids
+    for ty in range(y0, y1 + 1):
+        row = ty * layer.width
+        y = ty * size - origin[1]
+        for tx in range(x0, x1 + 1):
+            tile_id = ids[row + tx]
+            if tile_id == EMPTY:
+                continue
+            x = tx * size - origin[0]
+            image = table.image(tile_id)
+            if image:
+                surface.blit(image, (x, y))
+            else:
+                pygame.draw.rect(surface, table.color(layer.name, tile_id), (x, y, size, size))
+
+
+# Contorno de 1 px de um retângulo (ex.: debug das paredes)
+# pygame.draw.rect com largura recorta o retângulo pela área de recorte antes
+# de desenhar o contorno, então numa área estreita (a faixa que entra na tela
+# quando a câmera anda 1-3 px) ele pinta a faixa inteira. As linhas são
+# recortadas pixel a pixel e dão o mesmo contorno com ou sem recorte.
+def draw_outline(surface, color, rect):
+    rect = pygame.Rect(rect)
+    if rect.width <= 0 or rect.height <= 0:
+        return
+    right = rect.right - 1
+    bottom = rect.bottom - 1
+    pygame.draw.lines(surface, color, True,
+                      [rect.topleft, (right, rect.top), (right, bottom), (rect.left, bottom)])
+
+
+# Converte a superfície para o formato da tela (quando já existe uma janela)
+def _convert(surface, alpha):
+    if pygame.display.get_surface() is None:
+        return surface
+    return surface.convert_alpha() if alpha else surface.convert()
+
+
+# Compositor de camadas estáticas
+# Cada camada é desenhada uma única vez numa superfície em cache e todas são
+# juntadas numa superfície final. O jogo faz um único blit por frame e o cache
+# só é refeito quando uma camada muda (set_layer / invalidate).
+# Com keep_layers=False as camadas são desenhadas direto na superfície final,
+# sem guardar uma superfície por camada (economiza memória nos chunks).
+class LayerCompositor:
+    def __init__(self, rect, layer_order, background=(0, 0, 0), keep_layers=True):
+        self.rect = pygame.Rect(rect)
+        self.layer_order = list(layer_order)
+        self.background = background
+        self.keep_layers = keep_layers
+        self.layers = {}          # nome da camada -> lista de tiles ou (TileLayer, TileTable)
+        self.layer_surfaces = {}  # nome da camada -> superfície já desenhada
+        self.surface = None       # composição final de todas as camadas
+
+    def set_layer(self, name, tiles):
+        if name not in self.layer_order:
+            self.layer_order.append(name)
+        self.layers[name] = list(tiles)
+        self.invalidate(name)
+
+    # Usa uma camada compacta direto, sem criar um dict por tile
+    def set_grid_layer(self, layer, table):
+        if layer.name not in self.layer_order:
+            self.layer_order.append(layer.name)
+        self.layers[layer.name] = (layer, table)
+        self.invalidate(layer.name)
+
+    # Marca uma camada (ou todas, se name for None) para ser redesenhada
+    def invalidate(self, name=None):
+        if name is None:
+            self.layer_surfaces.clear()
+        else:
+            self.layer_surfaces.pop(name, None)
+        self.surface = None
+
+    def _draw_layer(self, surface, name):
+        source = self.layers[name]
+        if isinstance(source, tuple):
+            layer, table = source
+            draw_grid_layer(surface, layer, table, self.rect, self.rect.topleft)
+        else:
+            for tile in source:
+                draw_tile(surface, tile, self.rect.topleft)
+
+    def render_layer(self, name):
+        surface = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+        self._draw_layer(surface, name)
+        return _convert(surface, True)
+
+    def get_surface(self):
+        if self.surface is None:
+            surface = pygame.Surface(self.rect.size)
+            surface.fill(self.background)
+            for name in self.layer_order:
+                if not self.layers.get(name):
+                    continue
+                if not self.keep_layers:
+                    self._draw_layer(surface, name)
+                    continue
+                if name not in self.layer_surfaces:
+                    self.layer_surfaces[name] = self.render_layer(name)
+                surface.blit(self.layer_surfaces[name], (0, 0))
+            self.surface = _convert(surface, False)
+        return self.surface
+
+    # Redesenha na composição só uma área (ex.: a célula de um tile animado),
+    # com todas as camadas na ordem. area fica nas coordenadas das camadas.
+    def redraw_area(self, area):
+        if self.surface is None:
+            return
+        local = area.move(-self.rect.x, -self.rect.y).clip(self.surface.get_rect())
+        self.surface.fill(self.background, local)
+        self.surface.set_clip(local)
+        for name in self.layer_order:
+            source = self.layers.get(name)
+            if not source:
+                continue
+            if isinstance(source, tuple):
+                layer, table = source
+                draw_grid_layer(self.surface, layer, table, area, self.rect.topleft)
+            else:
+                for tile in source:
+                    if tile['rect'].colliderect(area):
+                        draw_tile(self.surface, tile, self.rect.topleft)
+        self.surface.set_clip(None)
+        # As superfícies por camada ficaram com o quadro antigo
+        self.layer_surfaces.clear()
+
+    def draw(self, surface, pos=None):
+        surface.blit(self.get_surface(), pos if pos is not None else self.rect.topleft)
+
+
+# Câmera que segue o jogador dentro dos limites do mapa
+class Camera:
+    def __init__(self, width, height, world_width, world_height):
+        self.rect = pygame.Rect(0, 0, width, height)
+        self.world_rect = pygame.Rect(0, 0, world_width, world_height)
+
+    def follow(self, target_rect):
+        self.rect.center = target_rect.center
+        self.rect.clamp_ip(self.world_rect)
+
+    # Converte um retângulo do mundo para coordenadas da tela
+    def apply(self, rect):
+        return rect.move(-self.rect.x, -self.rect.y)
+
+    def is_visible(self, rect):
+        return self.rect.colliderect(rect)
+
+
+# Renderizador em chunks
+# O mapa é dividido em blocos de chunk_size x chunk_size tiles e cada bloco é
+# um LayerCompositor desenhado só quando aparece na tela pela primeira vez.
+# Por frame só são desenhados os chunks que cruzam a câmera, então o custo
+# depende do tamanho da tela e não do tamanho do mapa.
+class ChunkRenderer:
+    def __init__(self, map_width, map_height, tile_size, layer_order,
+                 chunk_size=16, background=(0, 0, 0)):
+        self.map_width = map_width
+        self.map_height = map_height
+        self.tile_size = tile_size
+        self.layer_order = list(layer_order)
+        self.chunk_size = chunk_size
+        self.chunk_pixels = chunk_size * tile_size
+        self.background = background
+        self.chunks = {}  # (cx, cy) -> LayerCompositor
+        self.baked = None      # imagens de chunks salvas em disco (BakedChunks)
+        self.changed = set()   # chunks alterados depois de use_baked
+        self.animated = None   # tiles animados por chunk (AnimatedCells)
+
+        self.columns = (map_width + chunk_size - 1) // chunk_size
+        self.rows = (map_height + chunk_size - 1) // chunk_size
+        world = pygame.Rect(0, 0, map_width * tile_size, map_height * tile_size)
+        for cy in range(self.rows):
+            for cx in range(self.columns):
+                rect = pygame.Rect(cx * self.chunk_pixels, cy * self.chunk_pixels,
+                                   self.chunk_pixels, self.chunk_pixels).clip(world)
+                self.chunks[(cx, cy)] = LayerCompositor(rect, self.layer_order, background, keep_layers=False)
+
+    def chunk_at(self, x, y):
+        return (x // self.chunk_pixels, y // self.chunk_pixels)
+
+    # Usa imagens de chunks já desenhadas (BakedChunks) para o mapa como foi
+    # carregado. Chamar depois de montar as camadas: chunks invalidados a
+    # partir daqui são desenhados na hora e não vão para o disco.
+    def use_baked(self, baked):
+        self.baked = baked
+        self.changed = set()
+
+    # Superfície de um chunk: do disco quando possível, senão desenhada (e
+    # salva no disco para a próxima execução)
+    def chunk_surface(self, key):
+        chunk = self.chunks[key]
+        if chunk.surface is None and self.animated is not None:
+            self.animated.reset(key)
+        if chunk.surface is None and self.baked is not None and key not in self.changed:
+            chunk.surface = self.baked.load(key, chunk.rect.size)
+            if chunk.surface is None:
+                self.baked.save(key, chunk.get_surface())
+        return chunk.get_surface()
+
+    # Distribui os tiles da camada entre os chunks
+    def set_layer(self, name, tiles):
+        if name not in self.layer_order:
+            self.layer_order.append(name)
+        by_chunk = {}
+        for tile in tiles:
+            key = self.chunk_at(tile['rect'].x, tile['rect'].y)
+            by_chunk.setdefault(key, []).append(tile)
+        for key, chunk in self.chunks.items():
+            if key in by_chunk or name in chunk.layers:
+                chunk.set_layer(name, by_chunk.get(key, []))
+                self.changed.add(key)
+
+    # Camada compacta: todos os chunks usam a mesma grade de ids
+    def set_grid_layer(self, layer, table):
+        if layer.name not in self.layer_order:
+            self.layer_order.append(layer.name)
+        for chunk in self.chunks.values():
+            chunk.set_grid_layer(layer, table)
+        self.changed.update(self.chunks)
+
+    # Índices dos chunks que cruzam um retângulo em pixels do mundo
+    def chunks_in_rect(self, rect):
+        x0 = max(rect.left // self.chunk_pixels, 0)
+        y0 = max(rect.top // self.chunk_pixels, 0)
+        x1 = min((rect.right - 1) // self.chunk_pixels, self.columns - 1)
+        y1 = min((rect.bottom - 1) // self.chunk_pixels, self.rows - 1)
+        for cy in range(y0, y1 + 1):
+            for cx in range(x0, x1 + 1):
+                yield (cx, cy)
+
+    # Marca para redesenho uma camada (ou todas) nos chunks afetados
+    def invalidate(self, name=None, rect=None):
+        keys = self.chunks if rect is None else list(self.chunks_in_rect(rect))
+        for key in keys:
+            self.chunks[key].invalidate(name)
+            self.changed.add(key)
+
+    # Tiles animados (TileAnimations): procura uma vez em que chunks cada id
+    # animado aparece. Chamar depois de montar as camadas.
+    def set_animations(self, animations):
+        self.animated = AnimatedCells(animations)
+        size = self.tile_size
+        # Todos os chunks usam as mesmas camadas compactas
+        layers = set()
+        for chunk in self.chunks.values():
+            layers.update(source[0] for source in chunk.layers.values() if isinstance(source, tuple))
+        for layer in layers:
+            for tile_id, tx, ty in find_tiles(layer, animations.animations):
+                rect = pygame.Rect(tx * size, ty * size, size, size)
+                self.animated.add(self.chunk_at(rect.x, rect.y), tile_id, rect)
+
+    # Atualiza os tiles animados dos chunks visíveis e devolve as áreas (no
+    # mundo) redesenhadas. O custo por frame depende dos ids animados em cada
+    # chunk; células só são redesenhadas quando o quadro do id muda.
+    def update_animations(self, rect):
+        if self.animated is None:
+            return []
+        changed = []
+        for key in self.chunks_in_rect(rect):
+            changed.extend(self.animated.refresh(key, self.chunks[key]))
+        return changed
+
+    # Desenha os chunks visíveis e devolve quantos blits foram feitos
+    def draw(self, surface, camera):
+        blits = 0
+        for key in self.chunks_in_rect(camera.rect):
+            chunk = self.chunks[key]
+            surface.blit(self.chunk_surface(key), camera.apply(chunk.rect))
+            blits += 1
+        return blits
+
+
+# Renderização por retângulos sujos
+# O cenário visto pela câmera (tiles, itens ainda no chão, debug...) fica
+# numa superfície de fundo desenhada por draw_background(surface, camera).
+# A cada frame só são restauradas do fundo as áreas onde algum sprite esteve
+# no frame anterior ou que mudaram no cenário, e só essas áreas são
+# enviadas com pygame.display.update(rects). Quando a câmera anda, o fundo é
+# rolado e só as faixas que entraram na tela são desenhadas.
+class DirtyRectRenderer:
+    def __init__(self, screen, draw_background):
+        self.screen = screen
+        self.draw_background = draw_background
+        self.background = _convert(pygame.Surface(screen.get_size()), False)
+        self.camera_pos = None
+        self.full_update = True
+        self.invalid = []     # áreas do fundo a redesenhar (no mundo)
+        self.restore = []     # áreas a restaurar do fundo neste frame
+        self.sprites = []     # áreas ocupadas por sprites neste frame
+
+    # Marca uma área do mundo (ex.: item coletado) para redesenhar o fundo
+    def invalidate_world(self, rect):
+        self.invalid.append(pygame.Rect(rect))
+
+    def invalidate_all(self):
+        self.camera_pos = None
+
+    def _redraw(self, area, camera):
+        area = area.clip(self.background.get_rect())
+        if not area:
+            return
+        self.background.set_clip(area)
+        self.draw_background(self.background, camera)
+        self.background.set_clip(None)
+
+    # Prepara o frame: atualiza o fundo e apaga os sprites do frame anterior
+    def begin(self, camera):
+        screen_rect = self.background.get_rect()
+        pos = camera.rect.topleft
+        if self.camera_pos is None:
+            self._redraw(screen_rect, camera)
+            self.full_update = True
+        elif pos != self.camera_pos:
+            dx = self.camera_pos[0] - pos[0]
+            dy = self.camera_pos[1] - pos[1]
+            if abs(dx) >= screen_rect.width or abs(dy) >= screen_rect.height:
+                self._redraw(screen_rect, camera)
+            else:
+                self.background.scroll(dx, dy)
+                if dx > 0:
+                    self._redraw(pygame.Rect(0, 0, dx, screen_rect.height), camera)
+                elif dx < 0:
+                    self._redraw(pygame.Rect(screen_rect.width + dx, 0, -dx, screen_rect.height), camera)
+                if dy > 0:
+                    self._redraw(pygame.Rect(0, 0, screen_rect.width, dy), camera)
+                elif dy < 0:
+                    self._redraw(pygame.Rect(0, screen_rect.height + dy, screen_rect.width, -dy), camera)
+            self.full_update = True
+        self.camera_pos = pos
+
+        invalid = [camera.apply(rect) for rect in self.invalid]
+        for area in invalid:
+            self._redraw(area, camera)
+        self.restore = self.sprites + invalid
+        self.invalid = []
+        self.sprites = []
+
+        if self.full_update:
+            self.screen.blit(self.background, (0, 0))
+        else:
+            for area in self.restore:
+                self.screen.blit(self.background, area, area)
+
+    # Confere o fundo mantido aos pedaços (rolagem + faixas + áreas
+    # invalidadas) com um redesenho completo e devolve quantos pixels
+    # diferem. Lento; serve para depurar o draw_background: ele precisa
+    # desenhar igual com qualquer área de recorte.
+    def mismatch(self, camera):
+        full = pygame.Surface(self.background.get_size())
+        self.draw_background(full, camera)
+        full = _convert(full, False)
+        diff = full.copy()
+        diff.blit(self.background, (0, 0), special_flags=pygame.BLEND_RGB_SUB)
+        other = self.background.copy()
+        other.blit(full, (0, 0), special_flags=pygame.BLEND_RGB_SUB)
+        diff.blit(other, (0, 0), special_flags=pygame.BLEND_RGB_ADD)
+        same = pygame.mask.from_threshold(diff, (0, 0, 0), (1, 1, 1, 255)).count()
+        return diff.get_width() * diff.get_height() - same
+
+    # Informa a área (na tela) ocupada por algo desenhado por cima do fundo
+    def mark(self, rect):
+        self.sprites.append(pygame.Rect(rect))
+
+    # Envia para a janela só as áreas que mudaram
+    def end(self):
+        if self.full_update:
+            pygame.display.flip()
+            self.full_update = False
+            return 0
+        rects = self.restore + self.sprites
+        pygame.display.update(rects)
+        return len(rects)
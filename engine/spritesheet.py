@@ -0,0 +1,64 @@
+import pygame
+
+
+# Classe para carregar a spritesheet
+# get_sprite guarda cada recorte pelo retângulo de origem (x, y, w, h): todos
+# os tiles com o mesmo id usam a mesma imagem em vez de uma cópia por tile.
+# Os recortes são subsuperfícies da folha (sem cópia de pixels), então não
+# devem ser desenhados por cima.
+class SpriteSheet:
+    def __init__(self, filename):
+        self.cache = {}  # (x, y, w, h) -> superfície
+        self.hits = 0
+        self.misses = 0
+        try:
+            self.sheet = pygame.image.load(filename).convert_alpha()
+            print("Spritesheet carregada com sucesso!")
+        except Exception as e:
+            print(f"Erro ao carregar spritesheet: {e}")
+            self.sheet = None
+
+    # Cria a spritesheet a partir de uma superfície já carregada
+    @classmethod
+    def from_surface(cls, surface):
+        spritesheet = cls.__new__(cls)
+        spritesheet.cache = {}
+        spritesheet.hits = 0
+        spritesheet.misses = 0
+        spritesheet.sheet = surface
+        return spritesheet
+
+    # Converte a folha para o formato da tela. Precisa da janela aberta e deve
+    # rodar na thread principal (ex.: depois de carregar numa thread).
+    def convert(self):
+        if self.sheet is not None:
+            self.sheet = self.sheet.convert_alpha()
+            self.clear_cache()
+        return self
+
+    def get_sprite(self, x, y, width, height):
+        if not self.sheet:
+            return None
+        key = (x, y, width, height)
+        sprite = self.cache.get(key)
+        if sprite is not None:
+            self.hits += 1
+            return sprite
+
+        self.misses += 1
+        if self.sheet.get_rect().contains(key):
+            sprite = self.sheet.subsurface(key)
+        else:
+            # Recorte saindo da folha: copia só a parte que existe
+            sprite = pygame.Surface((width, height), pygame.SRCALPHA)
+            sprite.blit(self.sheet, (0, 0), key)
+        self.cache[key] = sprite
+        return sprite
+
+    def cache_stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'sprites': len(self.cache)}
+
+    def clear_cache(self):
+        self.cache.clear()
+        self.hits = 0
+        self.misses = 0
@@ -0,0 +1,384 @@
+import json
+import os
+import queue
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+
+import pygame
+
+from engine.animation import AnimatedCells, find_tiles
+from engine.cache import cache_dir_for, remove_stale
+from engine.collision import sweep_rect
+from engine.mapfile import collider_mask, load_map, map_key
+from engine.render import LayerCompositor
+from engine.tilemap import EMPTY, TileLayer
+
+# Mundo dividido em regiões
+# O mapa é gravado uma vez em arquivos de região (region_size x region_size
+# tiles cada) em .cache/<mapa>.<chave>.regions/, e durante o jogo só as
+# regiões perto da câmera ficam na memória: as vizinhas são lidas numa thread
+# em segundo plano antes de aparecerem e as mais antigas são descartadas
+# quando o total passa do orçamento de memória. Colisão e desenho consultam
+# a região certa de cada tile, então atravessar a borda entre duas regiões
+# não muda nada para o jogo.
+#
+#   world.meta:       JSON com tileSize, mapWidth, mapHeight, regionSize, as
+#                     camadas (nome, collider e quantidade de tiles), na ordem
+#                     do mapa, os ids usados (usedIds) e quantos tiles têm
+#                     colisão (solid)
+#   <rx>_<ry>.region: uma grade int32 little-endian por camada (só a área da
+#                     região) e a máscara de colisão, 1 byte por tile
+#
+# O meta tem tudo o que o jogo precisa saber do mapa inteiro antes de jogar
+# (tamanho, ids para montar o atlas, contagens do HUD), então com as regiões
+# já gravadas o mapa completo não é lido: a memória fica limitada ao
+# orçamento das regiões.
+
+# Mude quando o formato das regiões ou do meta mudar
+REGIONS_VERSION = 2
+
+
+def region_dir(json_path, region_size):
+    name = os.path.splitext(os.path.basename(json_path))[0]
+    return os.path.join(cache_dir_for(json_path),
+                        f'{name}.{map_key(json_path)}-{region_size}-{REGIONS_VERSION}.regions')
+
+
+# Grava as regiões de um TileMap
+def write_regions(tilemap, directory, region_size=16):
+    os.makedirs(directory, exist_ok=True)
+    width = tilemap.width
+    mask = tilemap.collider_mask
+    if mask is None:
+        mask = collider_mask(tilemap)
+    mask = memoryview(bytes(mask))
+
+    for ry in range(0, tilemap.height, region_size):
+        for rx in range(0, width, region_size):
+            w = min(region_size, width - rx)
+            h = min(region_size, tilemap.height - ry)
+            path = os.path.join(directory, f'{rx // region_size}_{ry // region_size}.region')
+            with open(path + '.tmp', 'wb') as f:
+                for layer in tilemap.layers:
+                    ids = array('i')
+                    for ty in range(ry, ry + h):
+                        ids.extend(layer.ids[ty * width + rx:ty * width + rx + w])
+                    if sys.byteorder != 'little':
+                        ids.byteswap()
+                    f.write(ids.tobytes())
+                for ty in range(ry, ry + h):
+                    f.write(mask[ty * width + rx:ty * width + rx + w])
+            os.replace(path + '.tmp', path)
+
+    # O meta é gravado por último: pasta sem meta é uma gravação incompleta
+    meta = {
+        'tileSize': tilemap.tile_size,
+        'mapWidth': tilemap.width,
+        'mapHeight': tilemap.height,
+        'regionSize': region_size,
+        'layers': [{'name': layer.name, 'collider': layer.collider, 'count': len(layer)}
+                   for layer in tilemap.layers],
+        'usedIds': sorted(tilemap.used_ids()),
+        'solid': len(mask) - mask.tobytes().count(0),
+    }
+    with open(os.path.join(directory, 'world.meta'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+
+
+# Pasta de regiões de um map.json, gerada na primeira vez (ou quando o
+# conteúdo do mapa muda) a partir do mapa compilado. Só a geração lê o mapa
+# inteiro.
+def open_regions(json_path, region_size=16):
+    directory = region_dir(json_path, region_size)
+    if not os.path.exists(os.path.join(directory, 'world.meta')):
+        write_regions(load_map(json_path), directory, region_size)
+        name = os.path.splitext(os.path.basename(json_path))[0]
+        remove_stale(cache_dir_for(json_path), name, 'regions', os.path.basename(directory).split('.')[1])
+    return directory
+
+
+# Resumo do mundo a partir do world.meta, sem ler nenhuma região
+# Tem o que os carregadores usam de um TileMap (tile_size, width, height,
+# used_ids, tile_count), então entra no lugar dele quando o mundo é lido por
+# regiões.
+class WorldInfo:
+    def __init__(self, directory):
+        with open(os.path.join(directory, 'world.meta'), encoding='utf-8') as f:
+            meta = json.load(f)
+        self.directory = directory
+        self.tile_size = meta['tileSize']
+        self.width = meta['mapWidth']
+        self.height = meta['mapHeight']
+        self.region_size = meta['regionSize']
+        self.layer_info = [(layer['name'], layer['collider']) for layer in meta['layers']]
+        self.counts = [(layer['name'], layer['count']) for layer in meta['layers']]
+        self.ids = meta['usedIds']
+        self.solid = meta['solid']  # tiles com colisão no mapa inteiro
+
+    def used_ids(self):
+        return set(self.ids)
+
+    # Tiles das camadas com os nomes dados (ou de todas)
+    def tile_count(self, names=None):
+        return sum(count for name, count in self.counts if names is None or name in names)
+
+
+# Regiões de um map.json (geradas se preciso) e o resumo delas
+def open_world(json_path, region_size=16):
+    return WorldInfo(open_regions(json_path, region_size))
+
+
+# Uma região carregada: camadas locais (coordenadas da região), máscara de
+# colisão e a composição das camadas, desenhada só quando aparece na tela
+class Region:
+    def __init__(self, key, rect, tx, ty, width, height, layers, mask):
+        self.key = key
+        self.rect = rect      # em pixels do mundo
+        self.tx = tx          # primeiro tile da região no mapa
+        self.ty = ty
+        self.width = width
+        self.height = height
+        self.layers = layers
+        self.mask = mask
+        self.compositor = None
+
+    @property
+    def nbytes(self):
+        total = len(self.mask) + sum(len(layer.ids) * 4 for layer in self.layers)
+        if self.compositor is not None and self.compositor.surface is not None:
+            surface = self.compositor.surface
+            total += surface.get_width() * surface.get_height() * surface.get_bytesize()
+        return total
+
+
+# Colisão e desenho do mundo a partir das regiões em volta da câmera
+# Tem a mesma interface do índice de colisão (is_solid, sweep, query...) e
+# do ChunkRenderer (draw, invalidate), então entra no lugar dos dois.
+# update(camera.rect) deve ser chamado a cada frame: ele recebe as regiões
+# lidas pela thread, pede as vizinhas e descarta as que passaram do
+# orçamento. Uma região que for necessária antes de chegar da thread (ex.:
+# teleporte) é lida na hora.
+class WorldStreamer:
+    def __init__(self, directory, table, layer_order, radius=1, memory_budget=64 << 20,
+                 background=(0, 0, 0)):
+        info = WorldInfo(directory)
+        self.info = info
+        self.directory = directory
+        self.table = table
+        self.layer_order = list(layer_order)
+        self.radius = radius                # regiões pré-carregadas em volta da câmera
+        self.memory_budget = memory_budget  # em bytes
+        self.background = background
+        self.tile_size = info.tile_size
+        self.width = info.width
+        self.height = info.height
+        self.region_size = info.region_size
+        self.layer_info = info.layer_info
+        self.columns = (self.width + self.region_size - 1) // self.region_size
+        self.rows = (self.height + self.region_size - 1) // self.region_size
+
+        self.regions = OrderedDict()  # (rx, ry) -> Region, da usada há mais tempo para a mais recente
+        self.pending = set()
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.loads = 0
+        self.evictions = 0
+        self.animated = None  # tiles animados por região (AnimatedCells)
+        self.thread = threading.Thread(target=self._worker, daemon=True)
+        self.thread.start()
+
+    # Área da região (rx, ry) em tiles
+    def _bounds(self, key):
+        size = self.region_size
+        tx, ty = key[0] * size, key[1] * size
+        return tx, ty, min(size, self.width - tx), min(size, self.height - ty)
+
+    # Lê o arquivo de uma região (roda na thread ou, se preciso, na hora)
+    def _read(self, key):
+        _, _, w, h = self._bounds(key)
+        with open(os.path.join(self.directory, f'{key[0]}_{key[1]}.region'), 'rb') as f:
+            data = f.read()
+        grids = []
+        for i in range(len(self.layer_info)):
+            ids = array('i')
+            ids.frombytes(data[i * w * h * 4:(i + 1) * w * h * 4])
+            if sys.byteorder != 'little':
+                ids.byteswap()
+            grids.append(ids)
+        mask = bytearray(data[len(grids) * w * h * 4:])
+        return grids, mask
+
+    def _worker(self):
+        while True:
+            key = self.requests.get()
+            if key is None:
+                return
+            try:
+                self.results.put((key, self._read(key)))
+            except OSError as e:
+                self.results.put((key, e))
+
+    def _install(self, key, data):
+        self.pending.discard(key)
+        if key in self.regions:
+            return self.regions[key]
+        if isinstance(data, Exception):
+            print(f"Erro ao carregar região {key}: {data}")
+            data = ([], bytearray())
+        grids, mask = data
+        tx, ty, w, h = self._bounds(key)
+        # Região ilegível ou incompleta vira uma região vazia
+        if len(mask) != w * h or len(grids) != len(self.layer_info):
+            grids = [array('i', [EMPTY]) * (w * h) for _ in self.layer_info]
+            mask = bytearray(w * h)
+        layers = [TileLayer(name, w, h, self.tile_size, collider, ids)
+                  for (name, collider), ids in zip(self.layer_info, grids)]
+        size = self.tile_size
+        rect = pygame.Rect(tx * size, ty * size, w * size, h * size)
+        region = Region(key, rect, tx, ty, w, h, layers, mask)
+        self._find_animated(region)
+        self.regions[key] = region
+        self.loads += 1
+        return region
+
+    # Região de uma chave, lida na hora se ainda não estiver na memória
+    def region(self, key):
+        region = self.regions.get(key)
+        if region is None:
+            try:
+                data = self._read(key)
+            except OSError as e:
+                data = e
+            region = self._install(key, data)
+        return region
+
+    def regions_in_rect(self, rect, margin=0):
+        size = self.region_size * self.tile_size
+        x0 = max(rect.left // size - margin, 0)
+        y0 = max(rect.top // size - margin, 0)
+        x1 = min((rect.right - 1) // size + margin, self.columns - 1)
+        y1 = min((rect.bottom - 1) // size + margin, self.rows - 1)
+        for ry in range(y0, y1 + 1):
+            for rx in range(x0, x1 + 1):
+                yield (rx, ry)
+
+    @property
+    def memory_used(self):
+        return sum(region.nbytes for region in self.regions.values())
+
+    # Atualiza as regiões em volta de rect (normalmente a câmera)
+    def update(self, rect):
+        while True:
+            try:
+                key, data = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self._install(key, data)
+
+        needed = set(self.regions_in_rect(rect, self.radius))
+        for key in self.regions_in_rect(rect, self.radius):
+            if key in self.regions:
+                self.regions.move_to_end(key)
+            elif key not in self.pending:
+                self.pending.add(key)
+                self.requests.put(key)
+
+        used = self.memory_used
+        for key in list(self.regions):
+            if used <= self.memory_budget:
+                break
+            if key in needed:
+                continue
+            used -= self.regions.pop(key).nbytes
+            self.evictions += 1
+            if self.animated is not None:
+                self.animated.forget(key)
+
+    def close(self):
+        self.requests.put(None)
+
+    # --- colisão (mesma interface de CollisionBitmap) ---
+
+    def is_solid(self, tx, ty):
+        if not (0 <= tx < self.width and 0 <= ty < self.height):
+            return False
+        size = self.region_size
+        region = self.region((tx // size, ty // size))
+        return region.mask[(ty - region.ty) * region.width + tx - region.tx] != 0
+
+    def sweep(self, rect, dx, dy):
+        return sweep_rect(rect, dx, dy, self.is_solid, self.tile_size)
+
+    def query(self, rect):
+        size = self.tile_size
+        found = []
+        for ty in range(max(rect.top // size, 0), min((rect.bottom - 1) // size, self.height - 1) + 1):
+            for tx in range(max(rect.left // size, 0), min((rect.right - 1) // size, self.width - 1) + 1):
+                if self.is_solid(tx, ty):
+                    found.append({'rect': pygame.Rect(tx * size, ty * size, size, size)})
+        return found
+
+    def collides(self, rect):
+        return bool(self.query(rect))
+
+    def collides_many(self, xs, ys, ws, hs):
+        return [self.collides(pygame.Rect(x, y, w, h)) for x, y, w, h in zip(xs, ys, ws, hs)]
+
+    # Tiles colisores nas regiões carregadas
+    def __len__(self):
+        return sum(region.mask.count(1) for region in self.regions.values())
+
+    # --- desenho (mesma interface do ChunkRenderer) ---
+
+    def _compositor(self, region):
+        if region.compositor is None:
+            if self.animated is not None:
+                self.animated.reset(region.key)
+            compositor = LayerCompositor(pygame.Rect(0, 0, region.rect.width, region.rect.height),
+                                         self.layer_order, self.background, keep_layers=False)
+            for layer in region.layers:
+                if layer.name in self.layer_order:
+                    compositor.set_grid_layer(layer, self.table)
+            region.compositor = compositor
+        return region.compositor
+
+    def invalidate(self, name=None, rect=None):
+        for region in self.regions.values():
+            if region.compositor is not None and (rect is None or region.rect.colliderect(rect)):
+                region.compositor.invalidate(name)
+
+    # Tiles animados (TileAnimations): cada região é varrida quando chega
+    def set_animations(self, animations):
+        self.animated = AnimatedCells(animations)
+        for region in self.regions.values():
+            self._find_animated(region)
+
+    # Células dos ids animados da região, em coordenadas da região
+    def _find_animated(self, region):
+        if self.animated is None:
+            return
+        size = self.tile_size
+        for layer in region.layers:
+            if layer.name in self.layer_order:
+                for tile_id, tx, ty in find_tiles(layer, self.animated.animations.animations):
+                    self.animated.add(region.key, tile_id, pygame.Rect(tx * size, ty * size, size, size))
+
+    def update_animations(self, rect):
+        if self.animated is None:
+            return []
+        changed = []
+        for key in self.regions_in_rect(rect):
+            region = self.regions.get(key)
+            if region is not None and region.compositor is not None:
+                changed.extend(self.animated.refresh(key, region.compositor, region.rect.topleft))
+        return changed
+
+    def draw(self, surface, camera):
+        blits = 0
+        for key in self.regions_in_rect(camera.rect):
+            region = self.region(key)
+            surface.blit(self._compositor(region).get_surface(), camera.apply(region.rect))
+            blits += 1
+        return blits
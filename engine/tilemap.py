@@ -0,0 +1,144 @@
+from array import array
+
+import pygame
+
+from engine.tileset import dense_positions
+
+# Valor usado nas células sem tile
+EMPTY = -1
+
+
+# Camada do mapa guardada como uma grade densa de ids (um int por célula).
+# Não existe um objeto por tile: retângulos e imagens são calculados na hora.
+class TileLayer:
+    def __init__(self, name, width, height, tile_size, collider=False, ids=None, count=None):
+        self.name = name
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.collider = collider
+        if ids is None:
+            ids = array('i', [EMPTY]) * (width * height)
+            count = 0
+        self.ids = ids
+        if count is None:
+            count = sum(1 for tile_id in ids if tile_id != EMPTY)
+        self.count = count
+
+    def get(self, tx, ty):
+        if not (0 <= tx < self.width and 0 <= ty < self.height):
+            return EMPTY
+        return self.ids[ty * self.width + tx]
+
+    def set(self, tx, ty, tile_id):
+        i = ty * self.width + tx
+        old = self.ids[i]
+        self.ids[i] = tile_id
+        self.count += (tile_id != EMPTY) - (old != EMPTY)
+
+    # Percorre os tiles existentes como (tx, ty, id)
+    def tiles(self):
+        width = self.width
+        for i, tile_id in enumerate(self.ids):
+            if tile_id != EMPTY:
+                yield i % width, i // width, tile_id
+
+    def __len__(self):
+        return self.count
+
+
+# Mapa compacto: tamanho, tamanho do tile e a lista de camadas
+class TileMap:
+    def __init__(self, tile_size, width, height):
+        self.tile_size = tile_size
+        self.width = width
+        self.height = height
+        self.layers = []
+        # 1 byte por célula (1 = algum tile colisor), quando o carregamento já
+        # calculou; senão o índice de colisão percorre as camadas colisoras
+        self.collider_mask = None
+
+    def add_layer(self, name, collider=False, ids=None, count=None):
+        layer = TileLayer(name, self.width, self.height, self.tile_size, collider, ids, count)
+        self.layers.append(layer)
+        return layer
+
+    def layer(self, name):
+        for layer in self.layers:
+            if layer.name == name:
+                return layer
+        return None
+
+    # Ids que aparecem em alguma camada
+    def used_ids(self):
+        ids = set()
+        for layer in self.layers:
+            ids.update(layer.ids)
+        ids.discard(EMPTY)
+        return ids
+
+    # Tiles das camadas com os nomes dados (ou de todas)
+    def tile_count(self, names=None):
+        return sum(len(layer) for layer in self.layers if names is None or layer.name in names)
+
+    def tile_rect(self, tx, ty):
+        return pygame.Rect(tx * self.tile_size, ty * self.tile_size, self.tile_size, self.tile_size)
+
+    # Converte o formato do map.json (tileSize, mapWidth, mapHeight, layers)
+    @classmethod
+    def from_json(cls, map_data):
+        tilemap = cls(map_data['tileSize'], map_data['mapWidth'], map_data['mapHeight'])
+        for layer_data in map_data['layers']:
+            layer = tilemap.add_layer(layer_data['name'], layer_data['collider'])
+            ids = layer.ids
+            width = tilemap.width
+            for tile in layer_data['tiles']:
+                ids[int(tile['y']) * width + int(tile['x'])] = int(tile['id'])
+            layer.count = sum(1 for tile_id in ids if tile_id != EMPTY)
+        return tilemap
+
+
+# Tabela por id: imagem de cada id (extraída uma vez da spritesheet) e a cor
+# usada quando não há imagem. Posições e imagens ficam em listas indexadas
+# pelo id (mapping pode ser um dict {id: (x, y)} ou uma lista já densa).
+# Com animations (TileAnimations), um id animado devolve a imagem do quadro
+# atual; os quadros são ids comuns da tabela, então cada imagem existe uma vez.
+class TileTable:
+    def __init__(self, spritesheet, mapping, tile_size, layer_colors=None,
+                 default_color=(200, 200, 200), unmapped_color=None, animations=None):
+        self.spritesheet = spritesheet
+        self.positions = dense_positions(mapping) if isinstance(mapping, dict) else list(mapping)
+        self.tile_size = tile_size
+        self.layer_colors = layer_colors or {}
+        self.default_color = default_color
+        self.unmapped_color = unmapped_color
+        self.images = [None] * len(self.positions)  # id -> superfície (ou None)
+        self.loaded = [False] * len(self.positions)
+        self.animations = animations
+
+    def image(self, tile_id):
+        if self.animations and tile_id in self.animations:
+            tile_id = self.animations.frame_id(tile_id)
+        return self.frame_image(tile_id)
+
+    # Imagem do próprio id, sem animação
+    def frame_image(self, tile_id):
+        if not 0 <= tile_id < len(self.positions):
+            return None
+        if self.loaded[tile_id]:
+            return self.images[tile_id]
+        image = None
+        pos = self.positions[tile_id]
+        if pos is not None and self.spritesheet and self.spritesheet.sheet:
+            image = self.spritesheet.get_sprite(pos[0], pos[1], self.tile_size, self.tile_size)
+        self.images[tile_id] = image
+        self.loaded[tile_id] = True
+        return image
+
+    def has_image(self, tile_id):
+        return 0 <= tile_id < len(self.positions) and self.positions[tile_id] is not None
+
+    def color(self, layer_name, tile_id):
+        if self.unmapped_color is not None and not self.has_image(tile_id):
+            return self.unmapped_color
+        return self.layer_colors.get(layer_name, self.default_color)
@@ -0,0 +1,132 @@
+import json
+import os
+import struct
+
+import pygame
+
+from engine.animation import Animation
+
+# Tileset calculado pela grade da spritesheet
+# A posição de cada id sai de uma conta, como o "ID sugerido" do acharid.py:
+# a folha é uma grade de tiles (com margem na borda e espaçamento entre
+# eles) e o id conta as células da esquerda para a direita, de cima para
+# baixo. O resultado é uma lista indexada pelo id, sem dicionário com chaves
+# em texto.
+#
+# Um arquivo opcional ao lado da folha (<folha>.tileset.json) ajusta a grade
+# e corrige ids que não seguem a conta:
+#
+#   {"tileSize": 64, "margin": 0, "spacing": 0,
+#    "tiles": {"106": [192, 832], "7": null},
+#    "animations": {"25": {"frames": [25, 26], "duration": 800}}}
+#
+# Todas as chaves são opcionais; um id com null fica sem imagem (usa a cor
+# da camada). As animações estão descritas em engine/animation.py.
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_SIZE = struct.Struct('>II')
+
+
+# Largura e altura da imagem. De um PNG só lê o cabeçalho, sem decodificar
+# os pixels.
+def sheet_size(sheet_path):
+    with open(sheet_path, 'rb') as f:
+        head = f.read(24)
+    if head[:8] == PNG_SIGNATURE and head[12:16] == b'IHDR':
+        return PNG_SIZE.unpack_from(head, 16)
+    return pygame.image.load(sheet_path).get_size()
+
+
+def tileset_path(sheet_path):
+    return os.path.splitext(sheet_path)[0] + '.tileset.json'
+
+
+class Tileset:
+    def __init__(self, columns, rows, tile_size, margin=0, spacing=0, overrides=None, animations=None):
+        self.columns = columns
+        self.rows = rows
+        self.tile_size = tile_size
+        self.margin = margin
+        self.spacing = spacing
+        step = tile_size + spacing
+        # id -> (x, y) na folha, ou None quando o id não tem imagem
+        self.positions = [(margin + (i % columns) * step, margin + (i // columns) * step)
+                          for i in range(columns * rows)]
+        for tile_id, pos in (overrides or {}).items():
+            tile_id = int(tile_id)
+            if tile_id >= len(self.positions):
+                self.positions.extend([None] * (tile_id + 1 - len(self.positions)))
+            self.positions[tile_id] = tuple(pos) if pos is not None else None
+        # id -> Animation
+        self.animations = {int(tile_id): Animation(data['frames'], data.get('duration', 100))
+                           for tile_id, data in (animations or {}).items()}
+
+    # Grade a partir do tamanho da folha
+    @classmethod
+    def from_sheet(cls, width, height, tile_size, margin=0, spacing=0, overrides=None, animations=None):
+        step = tile_size + spacing
+        columns = max((width - 2 * margin + spacing) // step, 0)
+        rows = max((height - 2 * margin + spacing) // step, 0)
+        return cls(columns, rows, tile_size, margin, spacing, overrides, animations)
+
+    def pos(self, tile_id):
+        if 0 <= tile_id < len(self.positions):
+            return self.positions[tile_id]
+        return None
+
+    # Id da célula que contém o ponto (x, y) da folha, ou None fora da grade
+    # (na margem ou no espaçamento)
+    def id_at(self, x, y):
+        step = self.tile_size + self.spacing
+        col, dx = divmod(x - self.margin, step)
+        row, dy = divmod(y - self.margin, step)
+        if not (0 <= col < self.columns and 0 <= row < self.rows) or dx >= self.tile_size or dy >= self.tile_size:
+            return None
+        return row * self.columns + col
+
+    # {id: (x, y)} dos ids que têm imagem; com ids, só desses e dos quadros
+    # das animações deles (ex.: os ids usados no mapa, para o atlas não
+    # copiar a folha inteira)
+    def mapping(self, ids=None):
+        if ids is None:
+            ids = range(len(self.positions))
+        ids = set(ids)
+        for tile_id in list(ids):
+            if tile_id in self.animations:
+                ids.update(self.animations[tile_id].frames)
+        return {tile_id: self.positions[tile_id] for tile_id in sorted(ids)
+                if 0 <= tile_id < len(self.positions) and self.positions[tile_id] is not None}
+
+    def __len__(self):
+        return len(self.positions)
+
+
+# Carrega o tileset de uma folha: a grade (tamanho do tile do mapa, margem e
+# espaçamento) e as correções do arquivo .tileset.json, quando existe
+def load_tileset(sheet_path, tile_size, margin=0, spacing=0):
+    overrides = animations = None
+    path = tileset_path(sheet_path)
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        tile_size = data.get('tileSize', tile_size)
+        margin = data.get('margin', margin)
+        spacing = data.get('spacing', spacing)
+        overrides = data.get('tiles')
+        animations = data.get('animations')
+    try:
+        width, height = sheet_size(sheet_path)
+    except (OSError, pygame.error) as e:
+        print(f"Erro ao ler o tamanho da spritesheet: {e}")
+        width = height = 0
+    return Tileset.from_sheet(width, height, tile_size, margin, spacing, overrides, animations)
+
+
+# Lista densa id -> posição a partir de um mapeamento {id: (x, y)} (chaves
+# em texto ou inteiras), convertendo cada id uma vez só
+def dense_positions(mapping):
+    mapping = {int(tile_id): tuple(pos) for tile_id, pos in mapping.items()}
+    positions = [None] * (max(mapping) + 1 if mapping else 0)
+    for tile_id, pos in mapping.items():
+        if tile_id >= 0:
+            positions[tile_id] = pos
+    return positions
@@ -0,0 +1,41 @@
+# Passo fixo de simulação
+# O tempo real de cada frame (clock.tick) vai para um acumulador e a
+# simulação anda em passos de tamanho fixo (1/rate s), quantos couberem.
+# Assim a velocidade do jogo não depende do FPS: se o desenho ficar lento, a
+# simulação dá mais passos no mesmo frame; se ficar rápido, alguns frames não
+# dão passo nenhum e o desenho interpola entre o passo anterior e o atual
+# usando alpha (0..1).
+class FixedTimestep:
+    def __init__(self, rate=60, max_steps=5):
+        self.rate = rate
+        self.step_ms = 1000.0 / rate
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        self.steps = 0
+
+    # Soma dt_ms ao acumulador e devolve quantos passos devem ser dados agora.
+    # Acima de max_steps o atraso é descartado, para um frame muito lento
+    # (carregamento, janela arrastada) não virar uma avalanche de passos.
+    def advance(self, dt_ms):
+        self.accumulator += dt_ms
+        steps = int(self.accumulator // self.step_ms)
+        if steps > self.max_steps:
+            steps = self.max_steps
+            self.accumulator = 0.0
+        else:
+            self.accumulator -= steps * self.step_ms
+        self.steps += steps
+        return steps
+
+    # Fração do próximo passo já decorrida, para interpolar o desenho
+    @property
+    def alpha(self):
+        return min(self.accumulator / self.step_ms, 1.0)
+
+
+# Interpola um retângulo entre a posição do passo anterior e a atual
+def lerp_rect(previous, current, alpha):
+    rect = current.copy()
+    rect.x = round(previous.x + (current.x - previous.x) * alpha)
+    rect.y = round(previous.y + (current.y - previous.y) * alpha)
+    return rect